@@ -0,0 +1,6 @@
+"""Storefront load benchmarks.
+
+Scripted user journeys drive the real routes in ``core/urls.py``, either
+in-process through the WSGI test client or over HTTP against a running
+server. Run them with ``python manage.py benchmark``; see ``runner.py``.
+"""
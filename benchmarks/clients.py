@@ -0,0 +1,119 @@
+import http.cookiejar
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.db import connection
+from django.test import Client
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Result:
+    """Outcome of one request: which route, how long, how many queries."""
+
+    __slots__ = ('route', 'status', 'seconds', 'queries')
+
+    def __init__(self, route, status, seconds, queries=None):
+        self.route = route
+        self.status = status
+        self.seconds = seconds
+        self.queries = queries
+
+    @property
+    def ok(self):
+        return self.status < 400
+
+
+class InProcessSession:
+    """One virtual user talking to the WSGI app through Django's test client.
+
+    Queries are counted with a database execute wrapper, so the count is exact
+    and works without DEBUG.
+    """
+
+    def __init__(self, host='127.0.0.1'):
+        self.client = Client(HTTP_HOST=host, raise_request_exception=False)
+
+    def login(self, user, password):
+        self.client.force_login(user)
+
+    def request(self, route, method, path, data=None):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        send = self.client.post if method == 'POST' else self.client.get
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            response = send(path, data or {})
+            seconds = time.perf_counter() - started
+        return Result(route, response.status_code, seconds, queries)
+
+
+def queries_from_server_timing(header):
+    """Read the query count reported by the request instrumentation middleware."""
+    match = re.search(r'db;[^,]*desc="(\d+) queries', header or '')
+    return int(match.group(1)) if match else None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """One virtual user talking to a live server, with its own cookie jar.
+
+    Redirects are not followed, so each timed request is exactly one route.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect,
+        )
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def login(self, user, password):
+        # Fetch the form first for the CSRF cookie
+        self.request('login', 'GET', '/accounts/login/')
+        self.request('login', 'POST', '/accounts/login/', {'login': user.username, 'password': password})
+
+    def request(self, route, method, path, data=None):
+        url = self.base_url + path
+        body = None
+        headers = {'Referer': url}
+        if method == 'POST':
+            data = {**(data or {}), 'csrfmiddlewaretoken': self.csrf_token()}
+            body = urllib.parse.urlencode(data).encode()
+            headers['X-CSRFToken'] = self.csrf_token()
+        request = urllib.request.Request(url, data=body, headers=headers, method=method)
+
+        started = time.perf_counter()
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                status = response.status
+                timing = response.headers.get('Server-Timing')
+        except urllib.error.HTTPError as error:
+            error.read()
+            status = error.code
+            timing = error.headers.get('Server-Timing')
+        except urllib.error.URLError as error:
+            raise BenchmarkError(f'Cannot reach {url}: {error.reason}')
+        seconds = time.perf_counter() - started
+        return Result(route, status, seconds, queries_from_server_timing(timing))
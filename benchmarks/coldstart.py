@@ -0,0 +1,68 @@
+"""Cold-start latency of the first requests a fresh process serves.
+
+Each sample starts a new Python process, as a serverless platform does, loads
+the WSGI application, optionally preloads the templates, and times the first
+and second request to every path. Each process gets an empty in-memory cache. Run it with ``manage.py benchmark_coldstart``.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def child(paths, preload):
+    """Runs in the fresh process: print timings in milliseconds as JSON."""
+    started = time.perf_counter()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'greenpie.settings')
+    from django.core.wsgi import get_wsgi_application
+    get_wsgi_application()
+    timings = {'setup_ms': (time.perf_counter() - started) * 1000}
+
+    from django.test import Client
+    from core.template_preload import preload_templates
+    started = time.perf_counter()
+    if preload:
+        preload_templates()
+    timings['preload_ms'] = (time.perf_counter() - started) * 1000
+
+    client = Client(HTTP_HOST='127.0.0.1')
+    for path in paths:
+        for attempt in ('first', 'second'):
+            started = time.perf_counter()
+            response = client.get(path)
+            timings[f'{path} {attempt}_ms'] = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise SystemExit(f'{path} returned {response.status_code}')
+    print(json.dumps(timings))
+
+
+def sample(paths, preload):
+    command = [sys.executable, '-m', 'benchmarks.coldstart', json.dumps(paths)]
+    if preload:
+        command.append('--preload')
+    # A cache of its own: pages cached by earlier samples would turn first requests into hits
+    env = {**os.environ, 'CACHE_BACKEND': 'locmem'}
+    output = subprocess.run(command, capture_output=True, text=True, check=True, env=env).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(paths, samples=5):
+    """Median and worst timings over ``samples`` fresh processes, without and with preloading."""
+    from .runner import percentile
+
+    report = {}
+    for mode, preload in (('cold', False), ('preloaded', True)):
+        runs = [sample(paths, preload) for _ in range(samples)]
+        report[mode] = {
+            metric: {
+                'p50': percentile(sorted(run[metric] for run in runs), 50),
+                'max': max(run[metric] for run in runs),
+            }
+            for metric in runs[0]
+        }
+    return report
+
+
+if __name__ == '__main__':
+    child(json.loads(sys.argv[1]), '--preload' in sys.argv[2:])
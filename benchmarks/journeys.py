@@ -0,0 +1,55 @@
+"""Scripted user journeys.
+
+Each journey is a function ``journey(session, context)`` that issues requests
+through ``session.request(route, method, path, data)`` and returns the list of
+results. ``route`` is the URL name from ``core/urls.py`` plus a variant, so
+timings are grouped per route.
+"""
+import datetime
+
+from django.urls import reverse
+
+
+def browse(session, context):
+    """Anonymous shopper: landing page, filters, search, a product page."""
+    rng = context.random
+    item = rng.choice(context.items)
+    return [
+        session.request('home', 'GET', reverse('core:home')),
+        session.request('home?category', 'GET', reverse('core:home') + f'?category={item.category}'),
+        session.request('home?q&sort', 'GET', reverse('core:home') + f'?q={item.name.split()[-1]}&sort=price-asc'),
+        session.request('home?cursor', 'GET', reverse('core:home') + '?sort=price-desc&cursor='),
+        session.request('product', 'GET', reverse('core:product', kwargs={'slug': item.slug})),
+    ]
+
+
+def purchase(session, context):
+    """Signed-in shopper: product, add to cart, cart, checkout, order history."""
+    rng = context.random
+    results = []
+    for item in rng.sample(context.items, min(3, len(context.items))):
+        results.append(session.request('product', 'GET', reverse('core:product', kwargs={'slug': item.slug})))
+        results.append(session.request('add-to-cart', 'GET', reverse('core:add-to-cart', kwargs={'slug': item.slug})))
+    results.append(session.request('order-summary', 'GET', reverse('core:order-summary')))
+    results.append(session.request('checkout', 'GET', reverse('core:checkout-page')))
+    results.append(session.request('checkout POST', 'POST', reverse('core:checkout-page'), {
+        'address1': '1 Main St',
+        'country': 'Canada',
+        'state': 'Ontario',
+        'zip_code': 'M1A 1A1',
+        'payment_type': 'credit',
+        'name_on_card': 'Load Test',
+        'card_number': '4111111111111111',
+        'expiration': '12/2030',
+        'cvv': '123',
+        'delivery_date': (datetime.date.today() + datetime.timedelta(days=2)).isoformat(),
+        'delivery_timeslot': '9am-12pm',
+    }))
+    results.append(session.request('order-history', 'GET', reverse('core:order-history')))
+    return results
+
+
+JOURNEYS = {
+    'browse': (browse, False),
+    'purchase': (purchase, True),
+}
@@ -0,0 +1,152 @@
+import math
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.db import connection
+
+from core.models import Item
+
+from .clients import BenchmarkError, HttpSession, InProcessSession
+from .journeys import JOURNEYS
+
+
+class JourneyContext:
+    """Per-worker state handed to journeys: a seeded RNG and the item sample."""
+
+    def __init__(self, rng, items):
+        self.random = rng
+        self.items = items
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(results, wall_seconds):
+    """Per-route and overall latency percentiles, throughput and query counts."""
+    def stats(group):
+        seconds = sorted(result.seconds for result in group)
+        queries = [result.queries for result in group if result.queries is not None]
+        return {
+            'requests': len(group),
+            'errors': sum(1 for result in group if not result.ok),
+            'p50_ms': round(percentile(seconds, 50) * 1000, 2),
+            'p95_ms': round(percentile(seconds, 95) * 1000, 2),
+            'p99_ms': round(percentile(seconds, 99) * 1000, 2),
+            'mean_ms': round(sum(seconds) / len(seconds) * 1000, 2),
+            'rps': round(len(group) / wall_seconds, 2),
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+
+    routes = {}
+    for result in results:
+        routes.setdefault(result.route, []).append(result)
+    return {
+        'routes': {route: stats(group) for route, group in sorted(routes.items())},
+        'total': stats(results),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(journeys, concurrency=4, iterations=10, seed=1, base_url=None,
+        user_prefix='pp-user-', password='password', sample_size=500):
+    """Run ``journeys`` from ``concurrency`` virtual users and return the report.
+
+    Each virtual user replays every journey ``iterations`` times. With a
+    ``base_url`` requests go over HTTP to that server; otherwise they go
+    through the WSGI app in this process, which also counts queries.
+    """
+    unknown = set(journeys) - set(JOURNEYS)
+    if unknown:
+        raise BenchmarkError(f'Unknown journeys: {", ".join(sorted(unknown))}')
+
+    items = list(Item.objects.only('slug', 'name', 'category').order_by('id')[:sample_size])
+    if not items:
+        raise BenchmarkError('No items to browse; run "manage.py prepopulate" first')
+    users = []
+    if any(JOURNEYS[name][1] for name in journeys):
+        users = list(User.objects.filter(username__startswith=user_prefix).order_by('id')[:concurrency])
+        if not users:
+            raise BenchmarkError(f'No users named "{user_prefix}*"; run "manage.py prepopulate" first')
+
+    def new_session():
+        return HttpSession(base_url) if base_url else InProcessSession()
+
+    lock = threading.Lock()
+    results = []
+
+    def worker(number):
+        context = JourneyContext(random.Random(seed + number), items)
+        anonymous = new_session()
+        signed_in = None
+        if users:
+            signed_in = new_session()
+            signed_in.login(users[number % len(users)], password)
+        own = []
+        for _ in range(iterations):
+            for name in journeys:
+                journey, needs_login = JOURNEYS[name]
+                own += journey(signed_in if needs_login else anonymous, context)
+        with lock:
+            results.extend(own)
+
+    def threaded_worker(number):
+        try:
+            worker(number)
+        finally:
+            # Each thread opened its own database connection
+            if not base_url:
+                connection.close()
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        worker(0)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for future in [pool.submit(threaded_worker, number) for number in range(concurrency)]:
+                future.result()
+    wall_seconds = time.perf_counter() - started
+
+    report = summarize(results, wall_seconds)
+    report['meta'] = {
+        'mode': 'http' if base_url else 'in-process',
+        'base_url': base_url,
+        'journeys': list(journeys),
+        'concurrency': concurrency,
+        'iterations': iterations,
+        'seed': seed,
+        'wall_seconds': round(wall_seconds, 3),
+        'revision': git_revision(),
+    }
+    return report
+
+
+def compare(old, new):
+    """Rows of (route, metric, old, new, change %) for routes present in both reports."""
+    rows = []
+    for route, after in new['routes'].items():
+        before = old['routes'].get(route)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'rps', 'queries_per_request'):
+            if before.get(metric) is None or after.get(metric) is None:
+                continue
+            change = (after[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            rows.append((route, metric, before[metric], after[metric], round(change, 1)))
+    return rows
@@ -56,7 +56,7 @@ def main(check_env, deploying):
     # TODO: this should be done by default in the migration step
     if prepopulate == 'y':
         process_makesuper = subprocess.check_call(
-            ['python', 'manage.py', 'prepopulate'])
+            ['python', 'manage.py', 'prepopulate', '--clear'])
 
     makesuper = input("Create the admin user? [y/n]: ")
     if makesuper == 'y':
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Register the cache invalidation and login signal handlers
+        from . import autocomplete, conditional, facets, fragments, middleware, promotions, search  # noqa: F401
@@ -0,0 +1,288 @@
+"""Trim the MDB5 stylesheet down to the selectors the templates can match.
+
+``used_tokens()`` scans templates (and form widget ``attrs`` in Python code)
+for class names, ids and ``data-*`` attributes; ``trim_css()`` keeps every
+rule with at least one selector those tokens can match. Classes built in
+templates (``alert-{{ message.tags }}``) keep every class with that prefix,
+and state classes that Bootstrap's JavaScript toggles are always kept.
+"""
+import os
+import re
+
+# Added and removed by Bootstrap's JavaScript rather than written in templates
+SAFELIST_CLASSES = {
+    'show', 'showing', 'hiding', 'collapse', 'collapsing', 'collapsed', 'active', 'disabled', 'fade',
+    'dropup', 'dropstart', 'dropend', 'dropdown-menu-end', 'modal-open', 'modal-backdrop',
+    'was-validated', 'is-valid', 'is-invalid', 'focus', 'alert-dismissible',
+}
+SAFELIST_ATTRIBUTES = {'data-bs-popper', 'data-popper-placement', 'data-mdb-theme'}
+# At-rules whose blocks hold more rules, which are trimmed recursively
+GROUPING_AT_RULES = ('@media', '@supports', '@layer', '@container', '@document')
+
+TEMPLATE_TAG = re.compile(r'{%.*?%}|{#.*?#}', re.S)
+TEMPLATE_VAR = re.compile(r'{{.*?}}', re.S)
+CLASS_ATTR = re.compile(r'\bclass\s*=\s*(["\'])(.*?)\1', re.S)
+ID_ATTR = re.compile(r'\bid\s*=\s*(["\'])(.*?)\1', re.S)
+DATA_ATTR = re.compile(r'\s(data-[\w-]+)')
+SCRIPT = re.compile(r'<script\b[^>]*>(.*?)</script>', re.S | re.I)
+STRING = re.compile(r'(["\'`])((?:\\.|(?!\1).)*)\1', re.S)
+PYTHON_CLASS = re.compile(r'["\']class["\']\]?\s*[:=]\s*["\']([^"\']*)["\']')
+
+SELECTOR_CLASS = re.compile(r'\.((?:\\.|[\w-])+)')
+SELECTOR_ID = re.compile(r'#((?:\\.|[\w-])+)')
+SELECTOR_ATTRIBUTE = re.compile(r'\[\s*([\w-]+)')
+# Any of these may match nothing yet still leave the selector valid
+FUNCTIONAL_PSEUDO = re.compile(r':(?:not|is|where|has|nth-[\w-]+)\(')
+# Placeholder for a template variable inside a class attribute
+MARKER = '\x00'
+
+
+class Tokens:
+    """Class names, class prefixes, ids and data attributes seen in markup."""
+
+    def __init__(self):
+        self.classes = set(SAFELIST_CLASSES)
+        self.prefixes = set()
+        self.ids = set()
+        self.attributes = set(SAFELIST_ATTRIBUTES)
+
+    def add_classes(self, value):
+        for token in value.split():
+            if MARKER in token:
+                prefix = token.split(MARKER)[0]
+                if prefix:
+                    self.prefixes.add(prefix)
+            elif token.endswith('-'):
+                # "btn-{% if %}primary{% endif %}" leaves a dangling prefix
+                self.prefixes.add(token)
+            else:
+                self.classes.add(token)
+
+    def update(self, other):
+        self.classes |= other.classes
+        self.prefixes |= other.prefixes
+        self.ids |= other.ids
+        self.attributes |= other.attributes
+
+    def has_class(self, name):
+        return name in self.classes or name.startswith(tuple(self.prefixes))
+
+
+def scan_template(source, tokens=None):
+    """Collect the tokens used by one template's markup and inline scripts."""
+    tokens = tokens or Tokens()
+    # Keep the words from inside {% if %} branches, drop the tags themselves
+    markup = TEMPLATE_VAR.sub(MARKER, TEMPLATE_TAG.sub(' ', source))
+    for _, value in CLASS_ATTR.findall(markup):
+        tokens.add_classes(value)
+    for _, value in ID_ATTR.findall(markup):
+        tokens.ids.update(value.replace(MARKER, ' ').split())
+    tokens.attributes.update(DATA_ATTR.findall(markup))
+    # Scripts may add classes or query them: count every word in a string literal
+    for script in SCRIPT.findall(source):
+        for _, literal in STRING.findall(script):
+            words = re.findall(r'[\w-]+', literal)
+            tokens.classes.update(words)
+            tokens.ids.update(words)
+            tokens.attributes.update(word for word in words if word.startswith('data-'))
+    return tokens
+
+
+def scan_python(source, tokens=None):
+    """Collect classes set on form widgets, e.g. ``attrs={'class': 'form-control'}``."""
+    tokens = tokens or Tokens()
+    for value in PYTHON_CLASS.findall(source):
+        tokens.add_classes(value)
+    return tokens
+
+
+def split_top_level(text, separator=','):
+    """Split on ``separator`` outside brackets, parentheses and strings."""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, char in enumerate(text):
+        if quote:
+            if char == quote and text[i - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def strip_functional_pseudo(selector):
+    """Drop the arguments of :not(), :is() and friends, which need not match."""
+    while match := FUNCTIONAL_PSEUDO.search(selector):
+        depth, end = 1, match.end()
+        while end < len(selector) and depth:
+            depth += {'(': 1, ')': -1}.get(selector[end], 0)
+            end += 1
+        selector = selector[:match.start()] + selector[end:]
+    return selector
+
+
+def unescape(name):
+    return re.sub(r'\\(.)', r'\1', name)
+
+
+def selector_matches(selector, tokens):
+    """Whether markup with ``tokens`` could match ``selector``."""
+    selector = strip_functional_pseudo(selector)
+    if any(not tokens.has_class(unescape(name)) for name in SELECTOR_CLASS.findall(selector)):
+        return False
+    if any(unescape(name) not in tokens.ids for name in SELECTOR_ID.findall(selector)):
+        return False
+    for name in SELECTOR_ATTRIBUTE.findall(selector):
+        if name.startswith('data-') and name not in tokens.attributes:
+            return False
+    return True
+
+
+def _skip_string_or_comment(css, i):
+    """If a string or comment starts at ``i``, return the index after it."""
+    if css.startswith('/*', i):
+        end = css.find('*/', i + 2)
+        return len(css) if end == -1 else end + 2
+    if css[i] in '"\'':
+        j = i + 1
+        while j < len(css) and css[j] != css[i]:
+            j += 2 if css[j] == '\\' else 1
+        return j + 1
+    return None
+
+
+def parse_css(css, i=0):
+    """Parse CSS into ``(prelude, body)`` nodes; ``body`` is a list for grouping at-rules."""
+    nodes, start = [], i
+    while i < len(css):
+        skipped = _skip_string_or_comment(css, i)
+        if skipped is not None:
+            if css.startswith('/*!', i):
+                # Licence comments are kept
+                nodes.append((css[i:skipped], None))
+                start = skipped
+            elif css.startswith('/*', i) and not css[start:i].strip():
+                start = skipped
+            i = skipped
+            continue
+        char = css[i]
+        if char == ';':
+            # Statement at-rule such as @charset or @import
+            statement = css[start:i].strip()
+            if statement:
+                nodes.append((statement + ';', None))
+            i = start = i + 1
+        elif char == '{':
+            prelude = css[start:i].strip()
+            if prelude.startswith(GROUPING_AT_RULES):
+                body, i = parse_css(css, i + 1)
+            else:
+                depth, j = 1, i + 1
+                while j < len(css) and depth:
+                    skipped = _skip_string_or_comment(css, j)
+                    if skipped is not None:
+                        j = skipped
+                        continue
+                    depth += {'{': 1, '}': -1}.get(css[j], 0)
+                    j += 1
+                body, i = css[i + 1:j - 1], j
+            nodes.append((prelude, body))
+            start = i
+        elif char == '}':
+            return nodes, i + 1
+        else:
+            i += 1
+    return nodes, i
+
+
+def trim_nodes(nodes, tokens):
+    kept = []
+    for prelude, body in nodes:
+        if body is None or prelude.startswith('@'):
+            if isinstance(body, list):
+                body = trim_nodes(body, tokens)
+                if not body:
+                    continue
+            kept.append((prelude, body))
+            continue
+        selectors = [s.strip() for s in split_top_level(prelude) if selector_matches(s.strip(), tokens)]
+        if selectors:
+            kept.append((','.join(selectors), body))
+    return kept
+
+
+def serialize(nodes):
+    out = []
+    for prelude, body in nodes:
+        if body is None:
+            out.append(prelude)
+        elif isinstance(body, list):
+            out.append(f'{prelude}{{{serialize(body)}}}')
+        else:
+            out.append(f'{prelude}{{{minify_declarations(body)}}}')
+    return ''.join(out)
+
+
+def minify_declarations(body):
+    # Values are left alone: an empty custom property ("--x: ;") needs its space
+    return re.sub(r'/\*.*?\*/', '', body, flags=re.S).strip('\r\n')
+
+
+def trim_css(css, tokens):
+    """Return ``css`` without the rules ``tokens`` cannot match, minified."""
+    nodes, _ = parse_css(css)
+    return serialize(trim_nodes(nodes, tokens))
+
+
+def template_names(directory):
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            if filename.endswith('.html'):
+                yield os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/')
+
+
+EXTENDS = re.compile(r'{%\s*extends\s+["\']([^"\']+)["\']')
+INCLUDE = re.compile(r'{%\s*include\s+["\']([^"\']+)["\']')
+
+
+def page_sources(directory):
+    """Map every page (a template extending another) to the sources it renders."""
+    sources = {}
+    for name in template_names(directory):
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            sources[name] = f.read()
+
+    def closure(name, seen):
+        if name in seen or name not in sources:
+            return
+        seen.add(name)
+        for parent in EXTENDS.findall(sources[name]) + INCLUDE.findall(sources[name]):
+            closure(parent, seen)
+
+    pages = {}
+    for name, source in sources.items():
+        if EXTENDS.search(source):
+            seen = set()
+            closure(name, seen)
+            pages[name] = [sources[n] for n in sorted(seen)]
+    return sources, pages
+
+
+def used_tokens(template_sources, python_dirs=()):
+    """Tokens of the given template sources plus form widget classes in ``python_dirs``."""
+    tokens = Tokens()
+    for source in template_sources:
+        scan_template(source, tokens)
+    for directory in python_dirs:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith('.py'):
+                    with open(os.path.join(root, filename), encoding='utf-8') as f:
+                        scan_python(f.read(), tokens)
+    return tokens
@@ -0,0 +1,118 @@
+import bisect
+import unicodedata
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import catalog_cache as cache
+from .models import Item
+from .promotions import get_promotion_index
+
+# Bumped on every Item write so each process knows its in-memory index is stale
+VERSION_CACHE_KEY = 'catalog:autocomplete-version'
+
+
+def normalize(text):
+    """Lowercase and strip accents, so "Jalapeño" is found by "jalapeno"."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in text if not unicodedata.combining(char)).strip()
+
+
+class PrefixIndex:
+    """Sorted arrays of normalized item names for prefix lookups.
+
+    ``names`` holds whole names and ``words`` every later word of a name, so
+    "gre" finds "Green Beans" first and "Sweet Green Peppers" after it. A lookup
+    is a binary search plus a walk over at most ``limit`` matches per array.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self.items = {}
+        names = []
+        words = []
+        for item in Item.objects.only('id', 'name', 'slug', 'price', 'image_url').order_by('id'):
+            self.items[item.id] = {
+                'name': item.name,
+                'slug': item.slug,
+                'price': item.price,
+                'image_url': item.image_url,
+                'url': item.get_abs_url(),
+            }
+            name = normalize(item.name)
+            names.append((name, item.id))
+            for word in name.split()[1:]:
+                words.append((word, item.id))
+        self.names = sorted(names)
+        self.words = sorted(words)
+
+    def _scan(self, entries, prefix):
+        start = bisect.bisect_left(entries, (prefix,))
+        for key, item_id in entries[start:]:
+            if not key.startswith(prefix):
+                break
+            yield item_id
+
+    def lookup(self, query, limit):
+        """Return up to ``limit`` item ids, whole-name matches first."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        found = []
+        for entries in (self.names, self.words):
+            for item_id in self._scan(entries, prefix):
+                if item_id not in found:
+                    found.append(item_id)
+                    if len(found) >= limit:
+                        return found
+        return found
+
+
+_index = None
+
+
+def get_prefix_index():
+    """Return this process's prefix index, rebuilding it after any Item write."""
+    global _index
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_CACHE_KEY, version, None)
+    if _index is None or _index.version != version:
+        _index = PrefixIndex(version)
+    return _index
+
+
+def suggest(query, limit):
+    """Top ``limit`` matches for ``query`` as JSON-ready dicts, with current prices."""
+    index = get_prefix_index()
+    promotions = get_promotion_index()
+    results = []
+    for item_id in index.lookup(query, limit):
+        entry = index.items[item_id]
+        promo = promotions.promotion_for(item_id)
+        discounted_price = None
+        if promo:
+            discounted_price = round(entry['price'] - entry['price'] * promo.discount_rate / 100, 2)
+        results.append({
+            'name': entry['name'],
+            'slug': entry['slug'],
+            'url': entry['url'],
+            'image_url': entry['image_url'],
+            'price': str(entry['price']),
+            'discounted_price': str(discounted_price) if discounted_price is not None else None,
+        })
+    return results
+
+
+def invalidate_prefix_index():
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 2, None)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def item_changed(sender, **kwargs):
+    invalidate_prefix_index()
@@ -0,0 +1,157 @@
+"""Cache backends that keep shared hit/miss counters, and the ``CACHES`` setting.
+
+Every subsystem has its own alias (``catalog``, ``promotions``, ``carts``,
+``sessions``) with its own key prefix, so their keys never collide and their
+counters are kept apart. The aliases share one store: ``clear()`` on any of
+them empties all of them.
+
+Counters are kept in process and added to ``cache-stats:hits``/``misses`` in
+the cache itself every ``STATS_FLUSH_EVERY`` lookups or ``STATS_FLUSH_SECONDS``
+and at exit, so ``manage.py cache_stats`` sees every process and instance.
+"""
+import atexit
+import logging
+import os
+import tempfile
+import time
+import weakref
+
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache as DjangoFileBasedCache
+from django.core.cache.backends.locmem import LocMemCache as DjangoLocMemCache
+from django.core.cache.backends.redis import RedisCache as DjangoRedisCache
+from django.utils.connection import ConnectionProxy
+
+NAMESPACES = ('catalog', 'promotions', 'carts', 'sessions')
+BACKENDS = {
+    'locmem': 'core.cache.LocMemCache',
+    'file': 'core.cache.FileBasedCache',
+    'redis': 'core.cache.RedisCache',
+}
+HITS_KEY = 'cache-stats:hits'
+MISSES_KEY = 'cache-stats:misses'
+STATS_FLUSH_EVERY = 100
+STATS_FLUSH_SECONDS = 10
+
+_MISSING = object()
+
+logger = logging.getLogger(__name__)
+
+# Every live counting backend; Django builds one per thread and alias
+_backends = weakref.WeakSet()
+
+
+def cache_settings(backend, location='', version=1, key_prefix='greenpie'):
+    """Build ``CACHES``: a ``default`` alias plus one per namespace, all on one store.
+
+    ``backend`` is ``locmem``, ``file`` or ``redis``; ``location`` is the
+    directory for ``file`` and the ``redis://`` URL for ``redis``. Raising
+    ``version`` orphans every key written by older code.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown cache backend {backend!r}, expected one of {", ".join(BACKENDS)}')
+    if backend == 'file':
+        location = location or os.path.join(tempfile.gettempdir(), 'greenpie-cache')
+    elif backend == 'locmem':
+        location = location or 'greenpie'
+
+    config = {}
+    for alias in ('default',) + NAMESPACES:
+        config[alias] = {
+            'BACKEND': BACKENDS[backend],
+            'LOCATION': location,
+            'KEY_PREFIX': f'{key_prefix}:{alias}',
+            'VERSION': version,
+            'TIMEOUT': 300,
+        }
+        if backend != 'redis':
+            # Room for page and fragment entries before culling starts
+            config[alias]['OPTIONS'] = {'MAX_ENTRIES': 10000}
+    return config
+
+
+# Like django.core.cache.cache, for the namespaces
+catalog_cache = ConnectionProxy(caches, 'catalog')
+promotions_cache = ConnectionProxy(caches, 'promotions')
+carts_cache = ConnectionProxy(caches, 'carts')
+
+
+class CacheStatsMixin:
+    """Count ``get()`` hits and misses, flushing them to shared counters in batches."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._hits = self._misses = 0
+        self._flushed_at = time.monotonic()
+        _backends.add(self)
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        if key not in (HITS_KEY, MISSES_KEY):
+            self.count(hits=int(value is not _MISSING), misses=int(value is _MISSING))
+        return default if value is _MISSING else value
+
+    def count(self, hits=0, misses=0):
+        self._hits += hits
+        self._misses += misses
+        if (
+            self._hits + self._misses >= STATS_FLUSH_EVERY
+            or time.monotonic() - self._flushed_at >= STATS_FLUSH_SECONDS
+        ):
+            self.flush_stats()
+
+    def flush_stats(self):
+        hits, misses = self._hits, self._misses
+        self._hits = self._misses = 0
+        self._flushed_at = time.monotonic()
+        try:
+            for key, delta in ((HITS_KEY, hits), (MISSES_KEY, misses)):
+                if delta:
+                    self._add_to_counter(key, delta)
+        except Exception:
+            # Statistics are best effort: an unreachable cache must not fail the caller
+            logger.warning('Could not flush cache statistics', exc_info=True)
+
+    def _add_to_counter(self, key, delta):
+        try:
+            self.incr(key, delta)
+        except ValueError:
+            # First flush, or the counter was evicted; another process may win the add()
+            if not self.add(key, delta, None):
+                self.incr(key, delta)
+
+    def read_stats(self):
+        """Return ``(hits, misses)`` counted so far by every process, this one included."""
+        self.flush_stats()
+        counters = super().get_many([HITS_KEY, MISSES_KEY])
+        return counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+
+    def reset_stats(self):
+        self._hits = self._misses = 0
+        self.delete_many([HITS_KEY, MISSES_KEY])
+
+
+@atexit.register
+def flush_all_stats():
+    """Flush every live backend; short-lived processes rarely fill a batch."""
+    for backend in list(_backends):
+        backend.flush_stats()
+
+
+class LocMemCache(CacheStatsMixin, DjangoLocMemCache):
+    pass
+
+
+class FileBasedCache(CacheStatsMixin, DjangoFileBasedCache):
+    pass
+
+
+class RedisCache(CacheStatsMixin, DjangoRedisCache):
+    """Any server speaking the Redis protocol (Redis, Valkey, KeyDB); needs the ``redis`` package."""
+
+    def get_many(self, keys, version=None):
+        # Unlike the other backends, this get_many() does not go through get()
+        keys = [key for key in keys if key not in (HITS_KEY, MISSES_KEY)]
+        found = super().get_many(keys, version=version)
+        self.count(hits=len(found), misses=len(keys) - len(found))
+        return found
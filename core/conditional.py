@@ -0,0 +1,88 @@
+import hashlib
+
+from django.contrib import messages
+from django.db.models import Max
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .cache import catalog_cache as cache
+from .models import Item, Promotion
+from .promotions import get_promotion_index
+
+CATALOG_VERSION_CACHE_KEY = 'catalog:version'
+
+
+def get_catalog_version():
+    """Return ``(counter, modified)`` for the catalog, changed by every Item/Promotion write.
+
+    If the cache lost it, ``modified`` is rebuilt from the newest ``updated_at``
+    and the counter restarts from zero.
+    """
+    version = cache.get(CATALOG_VERSION_CACHE_KEY)
+    if version is None:
+        newest = [
+            Item.objects.aggregate(newest=Max('updated_at'))['newest'],
+            Promotion.objects.aggregate(newest=Max('updated_at'))['newest'],
+        ]
+        version = (0, max((when for when in newest if when), default=timezone.now()))
+        cache.add(CATALOG_VERSION_CACHE_KEY, version, None)
+    return version
+
+
+def bump_catalog_version():
+    counter, _ = cache.get(CATALOG_VERSION_CACHE_KEY) or (0, None)
+    cache.set(CATALOG_VERSION_CACHE_KEY, (counter + 1, timezone.now()), None)
+
+
+def normalized_query(querydict):
+    """The query string with its parameters sorted, so ``?a=1&b=2`` and ``?b=2&a=1`` agree."""
+    return '&'.join(sorted(querydict.urlencode().split('&')))
+
+
+def _cacheable(request):
+    # Pending flash messages would never be shown if the page were a 304
+    return len(messages.get_messages(request)) == 0
+
+
+def catalog_etag(request, *args, **kwargs):
+    """ETag for a catalog page: catalog version, live promotions, user and URL."""
+    if not _cacheable(request):
+        return None
+    counter, modified = get_catalog_version()
+    parts = [
+        str(counter),
+        modified.isoformat(),
+        # Changes when promotions start or expire, which no signal reports
+        get_promotion_index().version,
+        str(request.user.pk),
+        request.path,
+        normalized_query(request.GET),
+    ]
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    if not _cacheable(request):
+        return None
+    _, modified = get_catalog_version()
+    return max(modified, get_promotion_index().built_at)
+
+
+# Answers If-None-Match/If-Modified-Since with a 304 before the view runs its queries
+catalog_condition = condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(m2m_changed, sender=Promotion.products.through)
+def catalog_products_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalog_version()
@@ -0,0 +1,58 @@
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import catalog_cache as cache
+from .models import CATEGORY_CHOICES, LABEL_CHOICES, Item
+
+FACETS_CACHE_KEY = 'catalog:facets'
+
+
+def count_facets(queryset, categories=(), labels=()):
+    """Return ``(category_facets, label_facets)`` for a catalog queryset.
+
+    Each facet is a ``(key, display, count)`` tuple. Counts come from a single
+    ``GROUP BY category, labels`` query. A category count respects the selected
+    labels and a label count respects the selected categories, so every option
+    shows how many items picking it would leave.
+    """
+    rows = (
+        queryset.order_by()
+        .values_list('category', 'labels')
+        .annotate(count=Count('id'))
+    )
+
+    category_counts = {}
+    label_counts = {}
+    for category, label, count in rows:
+        if not labels or label in labels:
+            category_counts[category] = category_counts.get(category, 0) + count
+        # Items without a label have no label facet
+        if label and (not categories or category in categories):
+            label_counts[label] = label_counts.get(label, 0) + count
+
+    category_dict = dict(CATEGORY_CHOICES)
+    label_dict = dict(LABEL_CHOICES)
+    return (
+        [(key, category_dict.get(key, key), count) for key, count in sorted(category_counts.items())],
+        [(key, label_dict.get(key, key), count) for key, count in sorted(label_counts.items())],
+    )
+
+
+def get_catalog_facets():
+    """Facets for the unfiltered catalog, cached until an item changes."""
+    facets = cache.get(FACETS_CACHE_KEY)
+    if facets is None:
+        facets = count_facets(Item.objects.all())
+        cache.set(FACETS_CACHE_KEY, facets, None)
+    return facets
+
+
+def invalidate_catalog_facets():
+    cache.delete(FACETS_CACHE_KEY)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def item_changed(sender, **kwargs):
+    invalidate_catalog_facets()
@@ -0,0 +1,49 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import catalog_cache as cache
+from .models import Item
+
+SIDEBAR_VERSION_CACHE_KEY = 'catalog:sidebar-version'
+# Fragment keys are versioned, so this only bounds how long unused ones linger
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+def get_sidebar_version():
+    """Version of the catalog filter sidebar, bumped on every Item write."""
+    version = cache.get(SIDEBAR_VERSION_CACHE_KEY)
+    if version is None:
+        version = 1
+        cache.add(SIDEBAR_VERSION_CACHE_KEY, version, None)
+    return version
+
+
+def invalidate_sidebar():
+    try:
+        cache.incr(SIDEBAR_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(SIDEBAR_VERSION_CACHE_KEY, 2, None)
+
+
+def sidebar_query(querydict):
+    """The request parameters the sidebar links depend on, in a stable order.
+
+    Its links drop ``page`` and ``cursor``, so those do not split the cache.
+    """
+    params = querydict.copy()
+    for name in ('page', 'cursor'):
+        params.pop(name, None)
+    return '&'.join(sorted(params.urlencode().split('&')))
+
+
+@receiver(pre_save, sender=Item)
+def bump_item_version(sender, instance, raw=False, **kwargs):
+    # A new version gives the item's product card a new fragment cache key
+    if not raw:
+        instance.version += 1
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def item_changed(sender, **kwargs):
+    invalidate_sidebar()
@@ -0,0 +1,185 @@
+import contextvars
+import functools
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.template.backends.django import Template
+
+logger = logging.getLogger('core.instrumentation')
+slow_logger = logging.getLogger('core.instrumentation.slow')
+
+# The metrics of the request being handled in this thread, if any
+_current = contextvars.ContextVar('request_metrics', default=None)
+_MISSING = object()
+
+
+class RequestMetrics:
+    """Timings and counters collected while one request is handled."""
+
+    def __init__(self, capture_sql=False):
+        self.started = time.perf_counter()
+        self.total_ms = 0.0
+        self.db_ms = 0.0
+        self.queries = 0
+        self.duplicates = 0
+        self.template_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._seen = set()
+        # Only sampled requests keep their SQL, for the slow request log
+        self.sql = [] if capture_sql else None
+
+    def record_query(self, sql, params, duration):
+        self.queries += 1
+        self.db_ms += duration * 1000
+        key = (sql, repr(params))
+        if key in self._seen:
+            self.duplicates += 1
+        else:
+            self._seen.add(key)
+        if self.sql is not None:
+            self.sql.append((round(duration * 1000, 2), sql))
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        return ', '.join([
+            f'total;dur={self.total_ms:.1f}',
+            f'db;dur={self.db_ms:.1f};desc="{self.queries} queries, {self.duplicates} duplicate"',
+            f'tpl;dur={self.template_ms:.1f}',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+        ])
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total_ms, 2),
+            'db_ms': round(self.db_ms, 2),
+            'queries': self.queries,
+            'duplicate_queries': self.duplicates,
+            'template_ms': round(self.template_ms, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+def _time_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.record_query(sql, params, time.perf_counter() - started)
+
+
+def _patch_template_render():
+    """Time top-level template renders; includes and extends are part of them."""
+    original = Template.render
+    if getattr(original, '_instrumented', False):
+        return
+
+    @functools.wraps(original)
+    def render(self, *args, **kwargs):
+        metrics = _current.get()
+        if metrics is None:
+            return original(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            metrics.template_ms += (time.perf_counter() - started) * 1000
+
+    render._instrumented = True
+    Template.render = render
+
+
+def _patch_cache_backend(backend_class):
+    """Count hits and misses of ``get``/``get_many`` on a cache backend class."""
+    if getattr(backend_class.get, '_instrumented', False):
+        return
+    original_get = backend_class.get
+    original_get_many = backend_class.get_many
+
+    @functools.wraps(original_get)
+    def get(self, key, default=None, version=None):
+        value = original_get(self, key, _MISSING, version=version)
+        metrics = _current.get()
+        if metrics is not None:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+
+    @functools.wraps(original_get_many)
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = original_get_many(self, keys, version=version)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+
+    get._instrumented = True
+    backend_class.get = get
+    # The default get_many() loops over get(), which already counts
+    if original_get_many is not BaseCache.get_many:
+        backend_class.get_many = get_many
+
+
+class RequestInstrumentationMiddleware:
+    """Measure every request and report it as a Server-Timing header and a DEBUG log record.
+
+    Records total time, DB time, query and duplicate-query counts, template
+    render time and cache hits/misses. A ``SLOW_REQUEST_SAMPLE_RATE`` share of
+    requests also keeps its SQL; those slower than ``SLOW_REQUEST_THRESHOLD_MS``
+    are logged with it to ``core.instrumentation.slow``. Works without DEBUG.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'SERVER_TIMING_HEADER', True)
+        self.slow_threshold_ms = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 500)
+        self.slow_sample_rate = getattr(settings, 'SLOW_REQUEST_SAMPLE_RATE', 0.0)
+        _patch_template_render()
+        for alias in settings.CACHES:
+            _patch_cache_backend(type(caches[alias]))
+
+    def __call__(self, request):
+        metrics = RequestMetrics(capture_sql=random.random() < self.slow_sample_rate)
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_time_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        metrics.finish()
+
+        request.metrics = metrics
+        if self.server_timing:
+            response['Server-Timing'] = metrics.server_timing()
+        # Every request at DEBUG; slow ones are reported below at WARNING
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                '%s %s %s %.1fms (%d queries)',
+                request.method, request.path, response.status_code, metrics.total_ms, metrics.queries,
+                extra={'request_metrics': metrics.as_dict(), 'path': request.path, 'status': response.status_code},
+            )
+        if metrics.sql is not None and metrics.total_ms >= self.slow_threshold_ms:
+            slow_logger.warning(
+                'Slow request %s %s: %.1fms, %d queries\n%s',
+                request.method, request.path, metrics.total_ms, metrics.queries,
+                '\n'.join(f'  ({ms} ms) {sql}' for ms, sql in metrics.sql),
+                extra={'request_metrics': metrics.as_dict(), 'path': request.path, 'sql': metrics.sql},
+            )
+        return response
@@ -0,0 +1,81 @@
+import atexit
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+class Lazy:
+    """Log argument computed only if the record is actually emitted.
+
+    ``logger.debug('%s lines', Lazy(order.items.count))`` runs no query unless
+    DEBUG logging is enabled. The value is computed on the calling thread, when
+    the queue handler formats the record, so database access stays safe.
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(*self.args, **self.kwargs))
+
+    __repr__ = __str__
+
+
+class QueueListenerHandler(QueueHandler):
+    """Hand records to a background thread which writes them to ``handlers``.
+
+    Request threads only format and enqueue; slow stream or file writes happen
+    in the listener thread, started with the first record. In the LOGGING
+    config, ``handlers`` are ``cfg://handlers.<name>`` references. They are
+    resolved on that first record, once dictConfig has built every handler,
+    so handler names can sort in any order.
+    """
+
+    def __init__(self, handlers, respect_handler_level=True):
+        super().__init__(queue.SimpleQueue())
+        # Indexing a dictConfig list converts its cfg:// entries; doing it now
+        # would catch handlers that are not built yet
+        self.targets = handlers
+        self.respect_handler_level = respect_handler_level
+        self.listener = None
+
+    def start(self):
+        handlers = [self.targets[i] for i in range(len(self.targets))]
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=self.respect_handler_level)
+        self.listener.start()
+        # Flush what is still queued when the process exits
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def emit(self, record):
+        if self.listener is None:
+            self.start()
+        super().emit(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including the ``extra`` fields of the record."""
+
+    # Attributes every LogRecord has; anything else came from ``extra``
+    RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self.RESERVED:
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.journeys import JOURNEYS
+from benchmarks.runner import BenchmarkError, compare, run
+
+
+class Command(BaseCommand):
+    help = 'Replay storefront user journeys and report latency, throughput and queries per route'
+
+    def add_arguments(self, parser):
+        parser.add_argument('journeys', nargs='*', default=list(JOURNEYS), help=f'Journeys to run ({", ".join(JOURNEYS)})')
+        parser.add_argument('--url', help='Base URL of a running server; default runs in-process')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent virtual users')
+        parser.add_argument('--iterations', type=int, default=10, help='Journey repetitions per virtual user')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--user-prefix', default='pp-user-', help='Username prefix of the accounts to sign in as')
+        parser.add_argument('--password', default='password', help='Password of those accounts (HTTP mode)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Earlier JSON report to show changes against')
+
+    def handle(self, *args, **options):
+        try:
+            report = run(
+                options['journeys'],
+                concurrency=options['concurrency'],
+                iterations=options['iterations'],
+                seed=options['seed'],
+                base_url=options['url'],
+                user_prefix=options['user_prefix'],
+                password=options['password'],
+            )
+        except BenchmarkError as error:
+            raise CommandError(error)
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Report written to {options["output"]}')
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.print_comparison(compare(json.load(f), report))
+
+    def print_report(self, report):
+        header = f'{"route":<20}{"reqs":>7}{"errors":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"rps":>9}{"queries":>9}'
+        self.stdout.write(header)
+        rows = list(report['routes'].items()) + [('TOTAL', report['total'])]
+        for route, stats in rows:
+            queries = '-' if stats['queries_per_request'] is None else f'{stats["queries_per_request"]:.1f}'
+            self.stdout.write(
+                f'{route:<20}{stats["requests"]:>7}{stats["errors"]:>8}{stats["p50_ms"]:>10.2f}'
+                f'{stats["p95_ms"]:>10.2f}{stats["p99_ms"]:>10.2f}{stats["rps"]:>9.1f}{queries:>9}'
+            )
+
+    def print_comparison(self, rows):
+        self.stdout.write('')
+        for route, metric, before, after, change in rows:
+            style = self.style.SUCCESS if (change <= 0) != (metric == 'rps') else self.style.WARNING
+            self.stdout.write(style(f'{route:<20}{metric:<22}{before:>10}{after:>10}{change:>+9.1f}%'))
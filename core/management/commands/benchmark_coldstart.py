@@ -0,0 +1,32 @@
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from benchmarks.coldstart import run
+from core.models import Item
+
+
+class Command(BaseCommand):
+    help = 'Time the first requests to / and /product/<slug>/ in fresh processes, with and without template preloading'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=5, help='Fresh processes per mode')
+
+    def handle(self, *args, **options):
+        item = Item.objects.order_by('id').first()
+        if item is None:
+            raise CommandError('Needs at least one item; run prepopulate first')
+        paths = [reverse('core:home'), reverse('core:product', kwargs={'slug': item.slug})]
+
+        try:
+            report = run(paths, options['samples'])
+        except subprocess.CalledProcessError as error:
+            raise CommandError(f'Benchmark process failed:\n{error.stderr}')
+
+        self.stdout.write(f'{"metric":<40}{"cold p50":>10}{"max":>9}{"preloaded p50":>15}{"max":>9}')
+        for metric, cold in report['cold'].items():
+            preloaded = report['preloaded'][metric]
+            self.stdout.write(
+                f'{metric:<40}{cold["p50"]:>10.1f}{cold["max"]:>9.1f}{preloaded["p50"]:>15.1f}{preloaded["max"]:>9.1f}'
+            )
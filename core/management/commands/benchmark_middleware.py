@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.middleware import compare_middleware
+from core.models import Item
+
+
+class Command(BaseCommand):
+    help = 'Compare the per-request overhead of PreventAutoLoginMiddleware with its previous implementation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=1000, help='Requests per route and visitor')
+
+    def handle(self, *args, **options):
+        item = Item.objects.order_by('id').first()
+        user = User.objects.filter(is_superuser=False).order_by('id').first()
+        if item is None or user is None:
+            raise CommandError('Needs at least one item and one customer; run prepopulate first')
+
+        self.stdout.write(f'{"route":<10}{"visitor":<11}{"queries before":>16}{"after":>7}{"µs before":>11}{"after":>8}')
+        for route, visitor, before, after in compare_middleware(item, user, options['iterations']):
+            self.stdout.write(
+                f'{route:<10}{visitor:<11}{before["queries"]:>16.1f}{after["queries"]:>7.1f}'
+                f'{before["us"]:>11.1f}{after["us"]:>8.1f}'
+            )
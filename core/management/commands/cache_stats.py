@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from core.cache import CacheStatsMixin
+
+
+class Command(BaseCommand):
+    help = 'Show cache hits and misses per namespace, summed over every process sharing the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"namespace":<12}{"backend":<16}{"version":>8}{"hits":>10}{"misses":>10}{"hit rate":>10}')
+        for alias in settings.CACHES:
+            cache = caches[alias]
+            if not isinstance(cache, CacheStatsMixin):
+                self.stdout.write(f'{alias:<12}{type(cache).__name__:<16}{cache.version:>8}{"not counted":>30}')
+                continue
+            hits, misses = cache.read_stats()
+            rate = f'{100 * hits / (hits + misses):.1f}%' if hits + misses else '-'
+            self.stdout.write(f'{alias:<12}{type(cache).__name__:<16}{cache.version:>8}{hits:>10}{misses:>10}{rate:>10}')
+            if options['reset']:
+                cache.reset_stats()
+        if options['reset']:
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
@@ -0,0 +1,127 @@
+import datetime
+import re
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Item, Order, OrderItem, Promotion
+
+# Plan lines that mean "read the whole table"
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING (COVERING )?INDEX\b)(?!.*VIRTUAL TABLE)(\w+)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def hot_queries(user, order, item):
+    """The lookups on the request hot path, as (name, queryset) pairs."""
+    now = timezone.now()
+    return [
+        ('open cart', Order.objects.filter(user=user, is_ordered=False)),
+        ('order history', Order.objects.filter(user=user, is_ordered=True).order_by('-ordered_date')),
+        ('order detail', Order.objects.filter(slug=order.slug, user=user, is_ordered=True)),
+        ('cart lines', OrderItem.objects.filter(order=order).select_related('item')),
+        ('cart line', OrderItem.objects.filter(order=order, item=item)),
+        ('active promotions', Promotion.objects.filter(is_active=True, end_date__gte=now).order_by('end_date')),
+        ('product page', Item.objects.filter(slug=item.slug)),
+        ('category filter', Item.objects.filter(category=item.category)),
+        ('label filter', Item.objects.filter(labels=item.labels)),
+        ('price range', Item.objects.filter(price__lte=item.price)),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot catalog/cart/order queries and fail if any plans a full table scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Plan against N synthetic items/users/orders inserted in a rolled-back transaction '
+                 '(default: use the data already in the database)',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'Query plans are not checked on {connection.vendor}')
+
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+            user, order, item = self.sample_rows()
+            failures = self.check_plans(pattern, hot_queries(user, order, item))
+            # Never keep the seeded rows
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'Full table scan in: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('No hot query plans a full table scan'))
+
+    def sample_rows(self):
+        order = Order.objects.exclude(user__isnull=True).select_related('user').order_by('-id').first()
+        item = Item.objects.order_by('-id').first()
+        if order is None or item is None:
+            raise CommandError('No orders or items to plan against; run with --seed N or prepopulate first')
+        return order.user, order, item
+
+    def check_plans(self, pattern, queries):
+        failures = []
+        for name, queryset in queries:
+            plan = queryset.explain()
+            scans = pattern.findall(plan)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: full scan of {", ".join(sorted(set(scans)))}'))
+            else:
+                self.stdout.write(f'{name}: ok')
+            if self.verbosity > 1:
+                self.stdout.write(plan)
+        return failures
+
+    def seed(self, count):
+        """Insert enough rows that the planner prefers indexes over scanning."""
+        User = get_user_model()
+        now = timezone.now()
+        categories = ['fruits', 'vegetables', 'herbs', 'microgreens', 'seasonal', 'organic']
+        labels = ['organic', 'vegan', 'locally_sourced', 'farm_fresh', '']
+
+        items = Item.objects.bulk_create(
+            Item(
+                name=f'Seed item {n}',
+                slug=f'seed-item-{n}',
+                price=Decimal(n % 500) / 10 + 1,
+                category=categories[n % len(categories)],
+                labels=labels[n % len(labels)],
+            )
+            for n in range(count)
+        )
+        users = User.objects.bulk_create(User(username=f'seed-user-{n}') for n in range(count))
+        orders = Order.objects.bulk_create(
+            Order(
+                user=users[n],
+                slug=f'seed{n}',
+                is_ordered=n % 2 == 0,
+                ordered_date=now if n % 2 == 0 else None,
+            )
+            for n in range(count)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, user=order.user, item=items[(n * 7) % count], quantity=1)
+            for n, order in enumerate(orders)
+        )
+        Promotion.objects.bulk_create(
+            Promotion(
+                title=f'Seed promotion {n}',
+                description='',
+                start_date=now - datetime.timedelta(days=n % 30),
+                end_date=now + datetime.timedelta(days=n % 30 - 15),
+                is_active=n % 3 != 0,
+            )
+            for n in range(count)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.template_preload import preload_templates, project_template_names, uses_cached_loader
+
+
+class Command(BaseCommand):
+    help = 'Compile every template in templates/ to catch syntax errors at build time and warm the cached loader'
+
+    def handle(self, *args, **options):
+        names = project_template_names()
+        started = time.perf_counter()
+        loaded, errors = preload_templates(names)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        for name, error in errors.items():
+            self.stderr.write(f'{name}: {error}')
+        if errors:
+            raise CommandError(f'{len(errors)} of {len(names)} templates failed to compile')
+
+        self.stdout.write(self.style.SUCCESS(f'Compiled {len(loaded)} templates in {elapsed:.1f}ms'))
+        if not uses_cached_loader():
+            self.stdout.write(self.style.WARNING('The cached template loader is not enabled; templates are re-parsed per render'))
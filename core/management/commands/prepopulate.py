@@ -0,0 +1,247 @@
+import datetime
+import random
+import time
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.autocomplete import invalidate_prefix_index
+from core.conditional import bump_catalog_version
+from core.facets import invalidate_catalog_facets
+from core.fragments import invalidate_sidebar
+from core.models import (
+    CATEGORY_CHOICES, LABEL_CHOICES, Address, Item, Order, OrderItem, Payment, Promotion, UserProfile,
+)
+from core.promotions import invalidate_promotion_index
+from core.search import get_search_backend
+
+# Generated rows are tagged with this prefix so --clear can find them again
+PREFIX = 'pp'
+
+ADJECTIVES = [
+    'Organic', 'Heirloom', 'Fresh', 'Crisp', 'Sweet', 'Wild', 'Baby', 'Golden',
+    'Red', 'Green', 'Purple', 'Local', 'Sun-Ripened', 'Early', 'Late-Harvest',
+]
+PRODUCE = [
+    'Apples', 'Pears', 'Carrots', 'Kale', 'Spinach', 'Tomatoes', 'Basil', 'Mint',
+    'Radishes', 'Beets', 'Peppers', 'Plums', 'Strawberries', 'Pea Shoots', 'Leeks',
+    'Squash', 'Garlic', 'Onions', 'Blueberries', 'Sunflower Sprouts',
+]
+FARMS = ['Oak Valley', 'Riverbend', 'Maple Ridge', 'Cedar Creek', 'Sunny Acres', 'Willow Farm']
+CITIES = ['Toronto', 'Ottawa', 'Hamilton', 'London', 'Kingston', 'Waterloo']
+TIMESLOTS = ['9am-12pm', '12pm-3pm', '3pm-6pm']
+STATUSES = ['Pending', 'Out For Shipping', 'Completed']
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset for development and load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1000, help='Number of items')
+        parser.add_argument('--promotions', type=int, default=20, help='Number of promotions')
+        parser.add_argument('--users', type=int, default=200, help='Number of users (each with a profile, address and payment)')
+        parser.add_argument('--orders-per-user', type=int, default=3, help='Orders per user; the last one may be an open cart')
+        parser.add_argument('--lines-per-order', type=int, default=5, help='Maximum lines per order')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same rows')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk INSERT')
+        parser.add_argument('--password', default='password', help='Password of every generated user')
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated rows first')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+
+        if options['clear']:
+            self.clear()
+        elif self.has_generated_rows():
+            # The generated slugs and usernames would collide with the existing ones
+            raise CommandError('Generated rows already exist; pass --clear to replace them')
+
+        items = self.create_items(options['items'])
+        self.create_promotions(options['promotions'], items)
+        users = self.create_users(options['users'], options['password'])
+        self.create_orders(users, items, options['orders_per_user'], options['lines_per_order'])
+
+        # bulk_create sends no signals, so refresh the derived indexes and caches
+        get_search_backend().rebuild()
+        invalidate_promotion_index()
+        invalidate_catalog_facets()
+        invalidate_prefix_index()
+        invalidate_sidebar()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS('Database prepopulated'))
+
+    def bulk_create(self, model, objects):
+        """Insert ``objects`` in batches and return their primary keys."""
+        started = time.perf_counter()
+        pks = []
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                pks += [obj.pk for obj in model.objects.bulk_create(batch)]
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{model.__name__}: {len(pks)} rows in {elapsed:.1f}s')
+        return pks
+
+    def has_generated_rows(self):
+        return (
+            Item.objects.filter(slug__startswith=f'{PREFIX}-').exists()
+            or User.objects.filter(username__startswith=f'{PREFIX}-').exists()
+            or Promotion.objects.filter(title__startswith=f'[{PREFIX}]').exists()
+        )
+
+    def clear(self):
+        with transaction.atomic():
+            # Profiles, addresses, payments, orders and lines cascade from the users
+            User.objects.filter(username__startswith=f'{PREFIX}-').delete()
+            Promotion.objects.filter(title__startswith=f'[{PREFIX}]').delete()
+            Item.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+        self.stdout.write('Removed previously generated rows')
+
+    def create_items(self, count):
+        categories = [key for key, _ in CATEGORY_CHOICES]
+        labels = [key for key, _ in LABEL_CHOICES] + ['']
+
+        def items():
+            for n in range(count):
+                name = f'{self.random.choice(ADJECTIVES)} {self.random.choice(PRODUCE)}'
+                yield Item(
+                    name=name,
+                    slug=f'{PREFIX}-{n}',
+                    category=self.random.choice(categories),
+                    labels=self.random.choice(labels),
+                    price=Decimal(self.random.randint(99, 2499)) / 100,
+                    description=f'{name} from {self.random.choice(FARMS)}, picked this week.',
+                    stock=self.random.randint(0, 500),
+                    farm_location=self.random.choice(FARMS),
+                    carbon_footprint=self.random.randint(1, 100),
+                )
+
+        return self.bulk_create(Item, items())
+
+    def create_promotions(self, count, item_ids):
+        def promotions():
+            for n in range(count):
+                # Mostly live promotions, some expired and some upcoming
+                offset = self.random.choice([-30, -1, -1, -1, 7])
+                start = self.now + datetime.timedelta(days=offset)
+                yield Promotion(
+                    title=f'[{PREFIX}] Promotion {n}',
+                    description='Generated promotion',
+                    start_date=start,
+                    end_date=start + datetime.timedelta(days=self.random.randint(3, 21)),
+                    discount_rate=Decimal(self.random.choice([5, 10, 15, 20, 25, 30])),
+                    is_active=self.random.random() > 0.1,
+                )
+
+        promotion_ids = self.bulk_create(Promotion, promotions())
+        if not item_ids:
+            return
+
+        Through = Promotion.products.through
+
+        def products():
+            for promotion_id in promotion_ids:
+                size = min(len(item_ids), self.random.randint(1, 50))
+                for item_id in self.random.sample(item_ids, size):
+                    yield Through(promotion_id=promotion_id, item_id=item_id)
+
+        self.bulk_create(Through, products())
+
+    def create_users(self, count, password):
+        # Hash once: hashing per user would dominate the run time
+        password = make_password(password, salt=f'{PREFIX}{count}')
+        user_ids = self.bulk_create(User, (
+            User(username=f'{PREFIX}-user-{n}', email=f'{PREFIX}-user-{n}@example.com', password=password)
+            for n in range(count)
+        ))
+
+        def profiles():
+            for n, user_id in enumerate(user_ids):
+                yield UserProfile(
+                    user_id=user_id,
+                    first_name='User',
+                    last_name=str(n),
+                    address=f'{self.random.randint(1, 999)} Main St',
+                    city=self.random.choice(CITIES),
+                    postal_code=f'M{self.random.randint(1, 9)}A{self.random.randint(1, 9)}B{self.random.randint(1, 9)}',
+                    phone=f'416{self.random.randint(0, 9999999):07d}',
+                )
+
+        def addresses():
+            for user_id in user_ids:
+                yield Address(
+                    user_id=user_id,
+                    address1=f'{self.random.randint(1, 999)} Main St',
+                    country='Canada',
+                    state='Ontario',
+                    zip_code=f'M{self.random.randint(1, 9)}A {self.random.randint(1, 9)}B{self.random.randint(1, 9)}',
+                )
+
+        def payments():
+            for n, user_id in enumerate(user_ids):
+                yield Payment(
+                    user_id=user_id,
+                    payment_type=self.random.choice(['credit', 'debit']),
+                    name_on_card=f'User {n}',
+                    card_number=f'4{self.random.randint(0, 10 ** 15 - 1):015d}',
+                    expiration='12/2030',
+                    cvv=f'{self.random.randint(0, 999):03d}',
+                )
+
+        self.bulk_create(UserProfile, profiles())
+        address_ids = self.bulk_create(Address, addresses())
+        payment_ids = self.bulk_create(Payment, payments())
+        return list(zip(user_ids, address_ids, payment_ids))
+
+    def create_orders(self, users, item_ids, orders_per_user, lines_per_order):
+        if not item_ids or not orders_per_user:
+            return
+        prices = dict(Item.objects.filter(pk__in=item_ids).values_list('pk', 'price'))
+        # Line specs are drawn up front so order totals can be filled in
+        order_lines = []
+
+        def orders():
+            n = 0
+            for user_id, address_id, payment_id in users:
+                for k in range(orders_per_user):
+                    # The last order of half the users is their open cart
+                    is_cart = k == orders_per_user - 1 and self.random.random() < 0.5
+                    lines = [
+                        (item_id, self.random.randint(1, 5))
+                        for item_id in self.random.sample(item_ids, min(len(item_ids), self.random.randint(1, lines_per_order)))
+                    ]
+                    order_lines.append(lines)
+                    total = sum(prices[item_id] * quantity for item_id, quantity in lines)
+                    n += 1
+                    order = Order(user_id=user_id, slug=f'{PREFIX}{n}', is_ordered=not is_cart)
+                    if not is_cart:
+                        order.address_id = address_id
+                        order.payment_id = payment_id
+                        order.ordered_date = self.now - datetime.timedelta(minutes=self.random.randint(1, 60 * 24 * 365))
+                        order.delivery_date = (order.ordered_date + datetime.timedelta(days=2)).date()
+                        order.delivery_timeslot = self.random.choice(TIMESLOTS)
+                        order.status = self.random.choice(STATUSES)
+                        order.final_price = round(total * Decimal('1.13'), 2)
+                    yield order
+
+        order_ids = self.bulk_create(Order, orders())
+        user_for_order = [user_id for user_id, _, _ in users for _ in range(orders_per_user)]
+
+        def lines():
+            for order_id, user_id, specs in zip(order_ids, user_for_order, order_lines):
+                for item_id, quantity in specs:
+                    yield OrderItem(order_id=order_id, user_id=user_id, item_id=item_id, quantity=quantity)
+
+        self.bulk_create(OrderItem, lines())
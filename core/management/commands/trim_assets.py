@@ -0,0 +1,69 @@
+import gzip
+import os
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+
+from core.assets import page_sources, trim_css, used_tokens
+
+BS_COMPONENT = re.compile(r'data-bs-(?:toggle|dismiss)\s*=\s*["\']([\w-]+)["\']')
+
+
+def sizes(text):
+    data = text.encode()
+    return len(data), len(gzip.compress(data, compresslevel=9))
+
+
+class Command(BaseCommand):
+    help = 'Write a trimmed, minified MDB stylesheet holding only the rules the templates use, and report savings per page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='css/mdb.min.css', help='Static path of the full stylesheet')
+        parser.add_argument('--output', default='css/mdb.trimmed.min.css', help='Static path to write the trimmed stylesheet to')
+        parser.add_argument(
+            '--output-dir', default=settings.STATICFILES_DIRS[0],
+            help='Static source directory to write into; collectstatic copies it to STATIC_ROOT',
+        )
+
+    def handle(self, *args, **options):
+        source_path = finders.find(options['source'])
+        if not source_path:
+            raise CommandError(f'{options["source"]} not found by the static file finders')
+        with open(source_path, encoding='utf-8') as f:
+            css = f.read()
+
+        template_dir = engines['django'].engine.dirs[0]
+        sources, pages = page_sources(template_dir)
+        # Form widgets set classes in Python code
+        python_dirs = [apps.get_app_config('core').path]
+        trimmed = trim_css(css, used_tokens(sources.values(), python_dirs))
+
+        output_path = os.path.join(options['output_dir'], options['output'])
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(trimmed)
+
+        full_raw, full_gz = sizes(css)
+        trimmed_raw, trimmed_gz = sizes(trimmed)
+        self.stdout.write(f'Wrote {output_path}')
+        self.stdout.write(
+            f'{"page":<32}{"full KB":>9}{"gzip":>8}{"trimmed KB":>12}{"gzip":>8}{"saved":>8}{"page only KB":>14}'
+        )
+        for page, page_templates in sorted(pages.items()):
+            page_only, _ = sizes(trim_css(css, used_tokens(page_templates, python_dirs)))
+            saved = 100 * (full_gz - trimmed_gz) / full_gz
+            self.stdout.write(
+                f'{page:<32}{full_raw / 1024:>9.1f}{full_gz / 1024:>8.1f}{trimmed_raw / 1024:>12.1f}'
+                f'{trimmed_gz / 1024:>8.1f}{saved:>7.0f}%{page_only / 1024:>14.1f}'
+            )
+
+        # The MDB JavaScript is a prebuilt bundle: report what the pages need from it
+        components = sorted({name for source in sources.values() for name in BS_COMPONENT.findall(source)})
+        self.stdout.write(
+            f'JavaScript components used: {", ".join(components) or "none"}. '
+            'They are provided by the Bootstrap bundle in base.html; no MDB JavaScript is needed.'
+        )
@@ -1,20 +1,51 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
 from django.shortcuts import redirect
+from django.urls import reverse
 from django.utils.deprecation import MiddlewareMixin
 
+logger = logging.getLogger(__name__)
+
+# Session flag set at login for superusers until they have been sent to the admin
+ADMIN_REDIRECT_PENDING = 'admin_redirect_pending'
+
+
+@receiver(user_logged_in)
+def flag_admin_redirect(sender, request, user, **kwargs):
+    if user.is_superuser and request is not None:
+        request.session[ADMIN_REDIRECT_PENDING] = True
+
+
 class PreventAutoLoginMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        
-        if request.user.is_authenticated and not request.session.get('redirected_to_admin', False):
-        
-            if request.user.is_superuser and not request.session.get('auto_login', False):
-            
-                request.session['redirected_to_admin'] = True
+    """Send superusers to the admin on the first request after they log in.
 
-                return redirect('admin:index')  
+    Whether a redirect is due is decided at login (see ``flag_admin_redirect``),
+    so this runs on every request without loading the user. Requests without a
+    session cookie and for static files return before the session is touched;
+    a superuser already in the admin has the pending redirect cleared instead.
+    """
+
+    def process_request(self, request):
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return None
+        path = request.path_info
+        if path.startswith(self.skip_prefixes()):
+            return None
+        pending = request.session.pop(ADMIN_REDIRECT_PENDING, False)
+        if pending and not path.startswith(self.admin_prefix()):
+            logger.debug("Redirecting superuser session to the admin")
+            return redirect('admin:index')
+        return None
 
-            if request.user.is_superuser and request.session.get('auto_login', False):
-                print(f"[DEBUG] Preventing auto-login for user: {request.user.username}")
-                del request.session['auto_login']  
-                return redirect('admin:login') 
+    def skip_prefixes(self):
+        return tuple(prefix for prefix in (settings.STATIC_URL, settings.MEDIA_URL) if prefix)
 
-        return None  
+    def admin_prefix(self):
+        prefix = getattr(self, '_admin_prefix', None)
+        if prefix is None:
+            # Resolved lazily: the URLconf is not loaded when middleware is built
+            prefix = self._admin_prefix = reverse('admin:index')
+        return prefix
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:00
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS core_item_fts USING fts5("
+            "name, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO core_item_fts (rowid, name, description) "
+            "SELECT id, name, description FROM core_item"
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE core_item ADD COLUMN search_vector tsvector")
+        schema_editor.execute(
+            "UPDATE core_item SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+        )
+        schema_editor.execute(
+            "CREATE INDEX core_item_search_vector_gin ON core_item USING GIN (search_vector)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS core_item_fts")
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS core_item_search_vector_gin")
+        schema_editor.execute("ALTER TABLE core_item DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_alter_order_tracking_no'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:30
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """Fold duplicate (order, item) cart lines into the oldest one."""
+    OrderItem = apps.get_model('core', 'OrderItem')
+    duplicates = (
+        OrderItem.objects.exclude(order_id='XXX').exclude(order_id__isnull=True)
+        .values('order_id', 'item')
+        .annotate(lines=Count('id'), keep=Min('id'), quantity=Sum('quantity'))
+        .filter(lines__gt=1)
+    )
+    for row in duplicates:
+        OrderItem.objects.filter(pk=row['keep']).update(quantity=row['quantity'])
+        OrderItem.objects.filter(order_id=row['order_id'], item=row['item']).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0042_item_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('order_id', 'XXX'), _negated=True), fields=('order_id', 'item'), name='unique_order_item'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_order_fk(apps, schema_editor):
+    """Point every line at its order, from the join table or the old string reference."""
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    Through = Order.items.through
+
+    order_for_line = {}
+    # A line should belong to one order; if it is in several, keep the oldest
+    for line_id, order_id in Through.objects.order_by('-order_id').values_list('orderitem_id', 'order_id'):
+        order_for_line[line_id] = order_id
+
+    order_ids = set(Order.objects.values_list('id', flat=True))
+    unlinked = OrderItem.objects.exclude(id__in=list(order_for_line)).exclude(order_ref__isnull=True)
+    for line_id, order_ref in unlinked.values_list('id', 'order_ref'):
+        if order_ref.isdigit() and int(order_ref) in order_ids:
+            order_for_line[line_id] = int(order_ref)
+
+    lines = [OrderItem(id=line_id, order_id=order_id) for line_id, order_id in order_for_line.items()]
+    OrderItem.objects.bulk_update(lines, ['order'], batch_size=BATCH_SIZE)
+
+
+def restore_join_table(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    Through = Order.items.through
+
+    rows = []
+    for line_id, order_id in OrderItem.objects.exclude(order__isnull=True).values_list('id', 'order_id'):
+        rows.append(Through(order_id=order_id, orderitem_id=line_id))
+    Through.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    for line in OrderItem.objects.exclude(order__isnull=True).only('id', 'order').iterator():
+        line.order_ref = str(line.order_id)
+        line.save(update_fields=['order_ref'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0043_orderitem_unique_order_item'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='orderitem',
+            name='unique_order_item',
+        ),
+        # Free the order_id column name for the foreign key
+        migrations.RenameField(
+            model_name='orderitem',
+            old_name='order_id',
+            new_name='order_ref',
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='core.order'),
+        ),
+        migrations.RunPython(backfill_order_fk, restore_join_table),
+        migrations.RemoveField(
+            model_name='order',
+            name='items',
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.order'),
+        ),
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='order_ref',
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'item'), name='unique_order_item'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_open_carts(apps, schema_editor):
+    """Fold extra open carts of a user into their oldest one."""
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    users = (
+        Order.objects.filter(is_ordered=False, user__isnull=False)
+        .values('user').annotate(carts=Count('id')).filter(carts__gt=1)
+        .values_list('user', flat=True)
+    )
+    for user_id in users:
+        keep, *extra = Order.objects.filter(user_id=user_id, is_ordered=False).order_by('id')
+        quantities = dict(keep.items.values_list('item_id', 'quantity'))
+        for line in OrderItem.objects.filter(order__in=extra):
+            if line.item_id in quantities:
+                OrderItem.objects.filter(order=keep, item_id=line.item_id).update(
+                    quantity=models.F('quantity') + line.quantity
+                )
+                line.delete()
+            else:
+                line.order = keep
+                line.save(update_fields=['order'])
+                quantities[line.item_id] = line.quantity
+        Order.objects.filter(pk__in=[order.pk for order in extra]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0044_orderitem_order_fk'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['category'], name='item_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['labels'], name='item_labels_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['price'], name='item_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'is_ordered', '-ordered_date'], name='order_user_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['end_date', 'start_date'], name='promotion_active_dates_idx'),
+        ),
+        migrations.RunPython(merge_open_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_ordered', False)), fields=('user',), name='one_open_cart_per_user'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0046_item_version'),
+    ]
+
+    operations = [
+        # Existing rows get the time of the migration
+        migrations.AddField(
+            model_name='item',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='promotion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
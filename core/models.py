@@ -1,5 +1,6 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce, Round
 from django.shortcuts import reverse
 from django.utils.text import slugify
 from django.utils import timezone
@@ -31,6 +32,36 @@ LABEL_CHOICES = (
 )
 
 
+class ItemQuerySet(models.QuerySet):
+    def with_active_discount(self):
+        """Annotate each item with its best active promotion rate and discounted price.
+
+        Adds ``active_discount_rate`` and ``active_discounted_price`` (both None when
+        no promotion applies) plus ``effective_price``, all in the same SQL statement.
+        """
+        now = timezone.now()
+        best_rate = Promotion.products.through.objects.filter(
+            item_id=models.OuterRef('pk'),
+            promotion__is_active=True,
+            promotion__start_date__lte=now,
+            promotion__end_date__gte=now,
+        ).order_by('-promotion__discount_rate', 'promotion_id').values('promotion__discount_rate')[:1]
+
+        price_field = models.DecimalField(max_digits=10, decimal_places=2)
+        return self.annotate(
+            active_discount_rate=models.Subquery(best_rate, output_field=Promotion._meta.get_field('discount_rate')),
+        ).annotate(
+            # Multiply by 0.01 rather than divide by 100 to avoid integer division on SQLite
+            active_discounted_price=Round(
+                models.F('price') - models.F('price') * models.F('active_discount_rate') * Decimal('0.01'),
+                2,
+                output_field=price_field,
+            ),
+        ).annotate(
+            effective_price=Coalesce('active_discounted_price', 'price', output_field=price_field),
+        )
+
+
 class Item(models.Model):
     name = models.CharField(max_length=100)
     category = models.CharField(
@@ -47,6 +78,19 @@ class Item(models.Model):
     slug = models.SlugField(default='test-product', unique=True)
     farm_location = models.CharField(max_length=100, blank=True)
     carbon_footprint = models.PositiveIntegerField(blank=True, null=True)
+    # Bumped on every save; part of the product card fragment cache key
+    version = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Catalog filters
+            models.Index(fields=['category'], name='item_category_idx'),
+            models.Index(fields=['labels'], name='item_labels_idx'),
+            models.Index(fields=['price'], name='item_price_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -62,14 +106,17 @@ class Item(models.Model):
         })
     
     def get_discounted_price(self):
-        active_promotions = self.promotions.filter(
-            is_active=True,
-            start_date__lte=timezone.now(),
-            end_date__gte=timezone.now()
-        )
-        if active_promotions.exists():
-            promo = active_promotions.first() 
-            discount_rate = Decimal(promo.discount_rate)
+        if hasattr(self, 'active_discount_rate'):
+            # Annotated by Item.objects.with_active_discount()
+            discount_rate = self.active_discount_rate
+            if discount_rate is not None:
+                discount_rate = Decimal(discount_rate).quantize(Decimal('0.01'))
+        else:
+            from .promotions import get_promotion_index
+            promo = get_promotion_index().promotion_for(self.pk)
+            discount_rate = promo.discount_rate if promo else None
+        if discount_rate is not None:
+            discount_rate = Decimal(discount_rate)
             discount = self.price * (discount_rate / 100)
             discounted_price = self.price - discount
             return (
@@ -81,6 +128,10 @@ class Item(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name) 
+        if kwargs.get('update_fields'):
+            # The fragment version (bumped in pre_save) and auto_now timestamp
+            # are only written when listed
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version', 'updated_at'}
         super().save(*args, **kwargs)
 
 class OrderItem(models.Model):
@@ -88,20 +139,24 @@ class OrderItem(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, blank=True, null=True)
     quantity = models.PositiveIntegerField(default=1)
     ordered = models.BooleanField(default=False)
-    order_id = models.CharField(max_length=150, null=True, default="XXX")
+    # Reverse accessor keeps ``order.items.all()`` working for the lines of an order
+    order = models.ForeignKey('Order', on_delete=models.CASCADE, related_name='items', null=True, blank=True)
     discounted_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
-
+    class Meta:
+        constraints = [
+            # One line per item in a cart, so concurrent adds bump the same row.
+            # Its (order, item) index also serves every cart line lookup.
+            models.UniqueConstraint(fields=['order', 'item'], name='unique_order_item'),
+        ]
 
     def get_active_promotion(self):
         """Returns the active promotion for this item, if any."""
-        now = timezone.now()
-        return Promotion.objects.filter(
-            is_active=True,
-            start_date__lte=now,
-            end_date__gte=now,
-            products=self.item
-        ).first()
+        if hasattr(self, '_active_promotion'):
+            # Already resolved by the order discount engine
+            return self._active_promotion
+        from .promotions import get_promotion_index
+        return get_promotion_index().promotion_for(self.item_id)
     
     def get_final_price_per_item(self):
         promo = self.get_active_promotion()
@@ -164,7 +219,6 @@ class Order(models.Model):
     payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, null=True, blank=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, blank=True, null=True)
 
-    items = models.ManyToManyField(OrderItem)
     start_date = models.DateTimeField(auto_now_add=True)
 
     ordered_date = models.DateTimeField(blank=True, null=True)
@@ -182,72 +236,59 @@ class Order(models.Model):
     final_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
     slug = models.SlugField(default='order', unique=True)
+
+    class Meta:
+        constraints = [
+            # At most one open cart per user; also indexes the cart lookup
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(is_ordered=False),
+                name='one_open_cart_per_user',
+            ),
+        ]
+        indexes = [
+            # Order history: a user's placed orders, newest first
+            models.Index(fields=['user', 'is_ordered', '-ordered_date'], name='order_user_history_idx'),
+        ]
     
     def get_active_promotions(self):
         """Return active promotions that apply to items in the order."""
-        now = timezone.now()
-        return Promotion.objects.filter(
-            is_active=True,
-            start_date__lte=now,
-            end_date__gte=now
-        )
+        from .promotions import get_promotion_index
+        return get_promotion_index().active
+
+    @property
+    def pricing(self):
+        """Totals for this order, computed once per instance (i.e. per request)."""
+        if getattr(self, '_pricing', None) is None:
+            from .pricing import OrderPricing
+            self._pricing = OrderPricing(self)
+        return self._pricing
+
+    def invalidate_pricing(self):
+        """Drop the cached totals and lines after the cart has been changed."""
+        self._pricing = None
+        getattr(self, '_prefetched_objects_cache', {}).pop('items', None)
 
     def calculate_discounts(self, save=False):
-        active_promotions = self.get_active_promotions()
-        total_discount = Decimal('0.00')
-        original_total = Decimal('0.00')
-        applied_promotions = []
-
-        for order_item in self.items.all():
-            item_total = order_item.item.price * order_item.quantity
-            original_total += item_total
-
-            matched_promotion = None
-            for promo in active_promotions:
-                if order_item.item in promo.products.all():
-                    matched_promotion = promo
-                    break
-
-            if matched_promotion:
-                discount = (matched_promotion.discount_rate / Decimal('100')) * item_total
-                total_discount += discount
-                applied_promotions.append({
-                    'item': order_item.item,
-                    'promotion': matched_promotion,
-                    'discount': discount
-                })
-
-        discounted_total = original_total - total_discount
-
-        return {
-            'original_total': original_total,
-            'total_discount': total_discount,
-            'discounted_total': discounted_total,
-            'applied_promotions': applied_promotions
-        }
+        """Return the order totals and the promotions applied to each line."""
+        return self.pricing.as_dict()
 
     def get_total_cost(self):
-        discount_data = self.calculate_discounts()
-        return round(discount_data['discounted_total'], 2)
+        return self.pricing.total_cost
     
     def get_original_total_cost(self):
-        return round(sum(item.item.price * item.quantity for item in self.items.all()), 2)
+        return round(self.pricing.original_total, 2)
 
     def get_total_count(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.pricing.total_count
 
     def get_taxes(self):
-        tax_rate = Decimal('0.13')  # 13% tax
-        total_cost = Decimal(str(self.get_total_cost()))  
-        return total_cost * tax_rate
+        return self.pricing.taxes
     
     
     def get_final_price(self):
         """Calculate the final price of the order, including discounts, taxes, and the original cost."""
-        total_cost = Decimal(str(self.get_total_cost()))
-        taxes = self.get_taxes()
-        final_price = round(total_cost + taxes, 2)
-        return final_price
+        return self.pricing.final_price
     
     
     def save(self, *args, **kwargs):
@@ -263,15 +304,20 @@ class Order(models.Model):
     def get_or_create_cart(cls, user):
         order = cls.objects.filter(user=user, is_ordered=False).first()
         if not order:
-            order = cls(user=user, is_ordered=False)
-            order.slug = uuid.uuid4().hex[:6]
-            order.save()
+            try:
+                with transaction.atomic():
+                    order = cls(user=user, is_ordered=False)
+                    order.slug = uuid.uuid4().hex[:6]
+                    order.save()
+            except IntegrityError:
+                # A concurrent request opened the cart first
+                order = cls.objects.get(user=user, is_ordered=False)
         return order
     
     def remove_item(self, order_item):
         """Helper method to remove an item from the order"""
-        self.items.remove(order_item)
         order_item.delete()
+        self.invalidate_pricing()
         self.save()
 
     def is_empty(self):
@@ -298,6 +344,18 @@ class Promotion(models.Model):
     discount_rate = models.DecimalField(max_digits=5, decimal_places=2, default=10, help_text="Enter as a percentage (e.g. 10.00 for 10%)")
     products = models.ManyToManyField(Item, related_name='promotions')
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Live and upcoming promotions, by when they end (the promotion index query)
+            models.Index(
+                fields=['end_date', 'start_date'],
+                condition=models.Q(is_active=True),
+                name='promotion_active_dates_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.title
     
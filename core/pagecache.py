@@ -0,0 +1,77 @@
+import datetime
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .cache import catalog_cache as cache
+from .conditional import get_catalog_version, normalized_query
+from .promotions import get_promotion_index
+
+PAGE_CACHE_PREFIX = 'pagecache'
+
+
+def is_anonymous(request):
+    """True when the request carries no session or flash messages.
+
+    Decided from the cookies alone, so neither the session nor the user is
+    loaded. Signed-in visitors always have a session cookie.
+    """
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES and CookieStorage.cookie_name not in request.COOKIES
+
+
+def page_cache_key(request):
+    # Every Item/Promotion write changes the catalog version, orphaning older entries;
+    # the promotion index version changes when a promotion starts or ends
+    counter, modified = get_catalog_version()
+    version = f'{counter}.{modified.timestamp()}.{get_promotion_index().version}'
+    url = f'{request.path}?{normalized_query(request.GET)}'
+    return f'{PAGE_CACHE_PREFIX}:{version}:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def page_cache_timeout(now=None):
+    """Seconds a page may be cached: ``PAGE_CACHE_TIMEOUT``, cut short by the next promotion boundary."""
+    timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+    valid_until = get_promotion_index().valid_until
+    if valid_until is not None:
+        seconds_left = (valid_until - (now or timezone.now())) / datetime.timedelta(seconds=1)
+        timeout = min(timeout, int(seconds_left))
+    return max(timeout, 0)
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def anonymous_page_cache(view):
+    """Serve anonymous GET/HEAD requests from a cache of whole responses.
+
+    Entries are keyed on path and normalized query string, dropped by any
+    catalog write and never outlive the next promotion start or end. Requests
+    with a session skip the cache and render their own navbar and cart.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not is_anonymous(request):
+            return view(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        response = cache.get(key)
+        if response is not None:
+            last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+            return get_conditional_response(request, response.get('ETag'), last_modified, response)
+
+        response = view(request, *args, **kwargs)
+        timeout = page_cache_timeout()
+        if timeout and _cacheable(response):
+            if hasattr(response, 'render') and callable(response.render):
+                response.add_post_render_callback(lambda rendered: cache.set(key, rendered, timeout))
+            else:
+                cache.set(key, response, timeout)
+        return response
+
+    return wrapper
@@ -0,0 +1,98 @@
+import base64
+import json
+import operator
+from functools import reduce
+
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps({'d': direction, 'k': [str(value) for value in values]})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, values = payload['d'], payload['k']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+def _seek_filter(keys, values, forward):
+    """Build the "row comes after (or before) these key values" predicate.
+
+    For keys (a, b) this is ``a > va OR (a = va AND b > vb)``, with the
+    comparison flipped for descending keys and when seeking backwards.
+    """
+    conditions = []
+    equal_so_far = Q()
+    for (field, descending), value in zip(keys, values):
+        lookup = 'gt' if descending != forward else 'lt'
+        conditions.append(equal_so_far & Q(**{f'{field}__{lookup}': value}))
+        equal_so_far &= Q(**{field: value})
+    return reduce(operator.or_, conditions)
+
+
+class KeysetPage:
+    """One page of a keyset (seek) paginated listing.
+
+    Cost does not depend on how deep the page is: the database seeks past the
+    previous page's last key instead of counting and skipping an OFFSET.
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate_keyset(queryset, keys, cursor, page_size):
+    """Return the page of ``queryset`` following ``cursor``.
+
+    ``keys`` is a list of ``(field, descending)`` pairs which must identify rows
+    uniquely, e.g. ``[('price', False), ('id', False)]``. An empty cursor returns
+    the first page.
+    """
+    forward = True
+    if cursor:
+        direction, values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise InvalidCursor(cursor)
+        forward = direction == 'next'
+        queryset = queryset.filter(_seek_filter(keys, values, forward))
+
+    ordering = [('-' if descending == forward else '') + field for field, descending in keys]
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not forward:
+        rows.reverse()
+
+    def cursor_for(direction, row):
+        return encode_cursor(direction, [getattr(row, field) for field, _ in keys])
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or not forward:
+            next_cursor = cursor_for('next', rows[-1])
+        if cursor and (forward or has_more):
+            previous_cursor = cursor_for('prev', rows[0])
+    return KeysetPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .models import OrderItem
+from .promotions import get_promotion_index
+
+
+def load_cart_lines(order):
+    """Load the order lines and their items in a single query.
+
+    The lines are stored in the order's prefetch cache, so later calls to
+    ``order.items.all()`` (views, templates) reuse them instead of querying again.
+    """
+    if 'items' not in getattr(order, '_prefetched_objects_cache', {}):
+        prefetch_related_objects(
+            [order],
+            Prefetch('items', queryset=OrderItem.objects.select_related('item')),
+        )
+    return list(order.items.all())
+
+
+def get_promotion_map(item_ids):
+    """Map item ids to the best active promotion that applies to them."""
+    index = get_promotion_index()
+    promotion_map = {}
+    for item_id in item_ids:
+        promo = index.promotion_for(item_id)
+        if promo:
+            promotion_map[item_id] = promo
+    return promotion_map
+
+
+TAX_RATE = Decimal('0.13')  # 13% HST
+
+
+class OrderPricing:
+    """Snapshot of an order's totals, computed once and reused for the request.
+
+    All line discounts are computed in one pass over a fixed number of queries
+    (cart lines + the cached promotion index), regardless of the number of lines or live
+    promotions. Built by ``Order.pricing``; call ``Order.invalidate_pricing()``
+    after the cart changes so the next access recomputes it.
+    """
+
+    def __init__(self, order):
+        self.lines = load_cart_lines(order)
+        promotion_map = get_promotion_map({line.item_id for line in self.lines})
+
+        self.total_discount = Decimal('0.00')
+        self.original_total = Decimal('0.00')
+        self.total_count = 0
+        self.applied_promotions = []
+
+        for order_item in self.lines:
+            matched_promotion = promotion_map.get(order_item.item_id)
+            # Remember the match so OrderItem price helpers don't query again
+            order_item._active_promotion = matched_promotion
+
+            item_total = order_item.item.price * order_item.quantity
+            self.original_total += item_total
+            self.total_count += order_item.quantity
+
+            if matched_promotion:
+                discount = (matched_promotion.discount_rate / Decimal('100')) * item_total
+                self.total_discount += discount
+                self.applied_promotions.append({
+                    'item': order_item.item,
+                    'promotion': matched_promotion,
+                    'discount': discount
+                })
+
+        self.discounted_total = self.original_total - self.total_discount
+        self.total_cost = round(self.discounted_total, 2)
+        self.taxes = Decimal(str(self.total_cost)) * TAX_RATE
+        self.final_price = round(Decimal(str(self.total_cost)) + self.taxes, 2)
+
+    def as_dict(self):
+        return {
+            'original_total': self.original_total,
+            'total_discount': self.total_discount,
+            'discounted_total': self.discounted_total,
+            'applied_promotions': self.applied_promotions
+        }
+
+    def as_json(self):
+        """Line and order totals as strings, for the cart JSON endpoints."""
+        def money(value):
+            return f'{value:.2f}'
+
+        return {
+            'lines': [
+                {
+                    'slug': line.item.slug,
+                    'quantity': line.quantity,
+                    'unit_price': money(line.get_final_price_per_item()),
+                    'total': money(line.get_final_price()),
+                }
+                for line in self.lines
+            ],
+            'total_count': self.total_count,
+            'original_total': money(self.original_total),
+            'total_discount': money(self.total_discount),
+            'total_cost': money(self.total_cost),
+            'taxes': money(self.taxes),
+            'final_price': money(self.final_price),
+        }
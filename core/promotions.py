@@ -0,0 +1,132 @@
+import datetime
+import hashlib
+import threading
+
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import promotions_cache as cache
+from .models import Item, Promotion
+
+INDEX_CACHE_KEY = 'promotions:active-index'
+# Upper bound for how long an index without upcoming boundaries is kept
+INDEX_MAX_AGE = 60 * 60 * 24
+
+# The index read by the current request, so it is unpickled once per request
+_request_memo = threading.local()
+
+
+class PromotionIndex:
+    """Active promotions and the best promotion for every item, built in two queries.
+
+    Items are mapped to ``(promotion id, discount rate)``; the promotions are
+    kept without their products, so the cached index stays small however many
+    items are on sale. The index is valid until ``valid_until``: the earliest
+    moment a live promotion ends or a scheduled one starts. Past that point it
+    is rebuilt on the next read.
+    """
+
+    def __init__(self, now=None):
+        now = now or timezone.now()
+        promotions = list(Promotion.objects.filter(is_active=True, end_date__gte=now).order_by('end_date'))
+
+        self.built_at = now
+        self.active = [promo for promo in promotions if promo.start_date <= now]
+        self.promotions = {promo.pk: promo for promo in self.active}
+        # One tuple per promotion, shared by its items, so it is pickled once
+        entries = {promo.pk: (promo.pk, promo.discount_rate) for promo in self.active}
+        self.by_item = {}
+        if entries:
+            links = Promotion.products.through.objects.filter(promotion_id__in=entries)
+            for promo_id, item_id in links.values_list('promotion_id', 'item_id'):
+                entry, best = entries[promo_id], self.by_item.get(item_id)
+                # Best deal wins; ties go to the oldest promotion
+                if best is None or (entry[1], -entry[0]) > (best[1], -best[0]):
+                    self.by_item[item_id] = entry
+
+        # Changes whenever any item's best promotion or rate does, including when
+        # promotions start or expire, so it can key cached prices
+        best = sorted((item_id, promo_id, str(rate)) for item_id, (promo_id, rate) in self.by_item.items())
+        self.version = hashlib.md5(repr(best).encode()).hexdigest()[:12]
+
+        boundaries = [promo.end_date for promo in self.active]
+        boundaries += [promo.start_date for promo in promotions if promo.start_date > now]
+        self.valid_until = min(boundaries) if boundaries else None
+
+    def is_stale(self, now=None):
+        if self.valid_until is None:
+            return False
+        return (now or timezone.now()) >= self.valid_until
+
+    def promotion_for(self, item_id):
+        """Return the active promotion with the highest discount for an item, if any.
+
+        Its ``products`` are not loaded.
+        """
+        entry = self.by_item.get(item_id)
+        return self.promotions[entry[0]] if entry else None
+
+
+def get_promotion_index():
+    """Return the cached promotion index, rebuilding it if missing or past a boundary.
+
+    During a request the index is read from the cache once and then reused.
+    """
+    now = timezone.now()
+    index = getattr(_request_memo, 'index', None)
+    if index is not None and not index.is_stale(now):
+        return index
+    index = cache.get(INDEX_CACHE_KEY)
+    if index is None or index.is_stale(now):
+        index = PromotionIndex(now)
+        timeout = INDEX_MAX_AGE
+        if index.valid_until is not None:
+            seconds_left = (index.valid_until - now) / datetime.timedelta(seconds=1)
+            timeout = max(1, min(timeout, int(seconds_left) + 1))
+        cache.set(INDEX_CACHE_KEY, index, timeout)
+    if getattr(_request_memo, 'active', False):
+        _request_memo.index = index
+    return index
+
+
+def invalidate_promotion_index():
+    _request_memo.index = None
+    cache.delete(INDEX_CACHE_KEY)
+
+
+@receiver(request_started)
+def start_request_memo(sender, **kwargs):
+    _request_memo.index = None
+    _request_memo.active = True
+
+
+@receiver(request_finished)
+def end_request_memo(sender, **kwargs):
+    _request_memo.index = None
+    _request_memo.active = False
+
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def promotion_changed(sender, **kwargs):
+    invalidate_promotion_index()
+
+
+@receiver(m2m_changed, sender=Promotion.products.through)
+def promotion_products_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_promotion_index()
+
+
+@receiver(post_save, sender=Item)
+def item_saved(sender, created, **kwargs):
+    # A new item id must not pick up an entry from an older index
+    if created:
+        invalidate_promotion_index()
+
+
+@receiver(post_delete, sender=Item)
+def item_deleted(sender, **kwargs):
+    invalidate_promotion_index()
@@ -0,0 +1,152 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Item
+
+FTS_TABLE = 'core_item_fts'
+
+
+def tokenize(query):
+    """Split a raw search string into word tokens safe to embed in a full-text query."""
+    return re.findall(r'\w+', query.lower())
+
+
+class SearchBackend:
+    """Item search over name and description.
+
+    ``search()`` filters a queryset down to matching items and annotates them with
+    ``search_rank`` (higher is more relevant). Backends with their own index keep
+    it up to date through ``index_item``/``remove_item``, called from the Item
+    save/delete signals below.
+    """
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def no_results(self, queryset):
+        # Keep the annotation so callers can still order by relevance
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def index_item(self, item):
+        pass
+
+    def remove_item(self, item_id):
+        pass
+
+    def rebuild(self):
+        """Re-index every item, e.g. after rows were bulk-created without signals."""
+        pass
+
+
+class BasicSearchBackend(SearchBackend):
+    """Substring match with no index, for databases without full-text support."""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 index in the ``core_item_fts`` virtual table, keyed by item id (rowid)."""
+
+    def match_expression(self, query):
+        # Every token must match, as a word prefix ("app" finds "apple")
+        return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return self.no_results(queryset)
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        ).annotate(
+            # bm25() is lower for better matches, so negate it
+            search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = core_item.id',
+                [match],
+                output_field=FloatField(),
+            )
+        )
+
+    def index_item(self, item):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [item.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+                [item.pk, item.name, item.description],
+            )
+
+    def remove_item(self, item_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [item_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description) '
+                f'SELECT id, name, description FROM core_item'
+            )
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Weighted ``tsvector`` column on ``core_item`` with a GIN index."""
+
+    VECTOR_SQL = (
+        "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    )
+
+    def tsquery(self, query):
+        return ' & '.join(f'{token}:*' for token in tokenize(query))
+
+    def search(self, queryset, query):
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return self.no_results(queryset)
+        return queryset.filter(
+            id__in=RawSQL(
+                "SELECT id FROM core_item WHERE search_vector @@ to_tsquery('english', %s)",
+                [tsquery],
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                "ts_rank(core_item.search_vector, to_tsquery('english', %s))",
+                [tsquery],
+                output_field=FloatField(),
+            )
+        )
+
+    def index_item(self, item):
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE core_item SET search_vector = {self.VECTOR_SQL} WHERE id = %s', [item.pk])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE core_item SET search_vector = {self.VECTOR_SQL}')
+
+
+def get_search_backend():
+    if connection.vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return BasicSearchBackend()
+
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance, **kwargs):
+    get_search_backend().index_item(instance)
+
+
+@receiver(post_delete, sender=Item)
+def unindex_item(sender, instance, **kwargs):
+    get_search_backend().remove_item(instance.pk)
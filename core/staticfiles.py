@@ -0,0 +1,129 @@
+import gzip
+import logging
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only .gz variants are written
+    brotli = None
+
+# Text formats worth compressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.html', '.txt', '.json', '.xml', '.ico', '.ttf', '.eot')
+# Preferred first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+# ManifestStaticFilesStorage inserts a 12 character hash before the extension
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+
+logger = logging.getLogger(__name__)
+
+
+def compress(content):
+    """Return ``(suffix, data)`` for every encoding that makes ``content`` smaller."""
+    variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content, quality=11)))
+    return [(suffix, data) for suffix, data in variants if len(data) < len(content)]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Content-hashed file names plus precompressed ``.gz``/``.br`` siblings.
+
+    Both are written by ``collectstatic``, so nothing is hashed or compressed
+    while serving. Templates referencing files that were never collected get
+    the plain URL (a 404 for that asset) instead of failing the page.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not in the manifest and not on disk, so it cannot be hashed
+            logger.warning('Static file %s was not collected; using its unhashed name', name)
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in sorted(names):
+                if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                    self.write_variants(name)
+
+    def write_variants(self, name):
+        with self.open(name) as f:
+            content = f.read()
+        for suffix, data in compress(content):
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(data))
+
+
+def accepted_encodings(header):
+    """Content codings the client accepts, ignoring those with ``q=0``."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            if params and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+@require_safe
+def serve(request, path):
+    """Serve a collected static file, precompressed when the client allows it.
+
+    Hashed names never change content, so they are cached for a year without
+    revalidation; anything else is revalidated on every use against its
+    Last-Modified date.
+    """
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404(path)
+    if not os.path.isfile(full_path):
+        raise Http404(path)
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    # The compressed variants are written with the file, so its date stands for them
+    mtime = os.stat(full_path).st_mtime
+    if not was_modified_since(request.headers.get('If-Modified-Since'), mtime):
+        response = HttpResponseNotModified()
+    else:
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encoding = None
+        for coding, suffix in ENCODINGS:
+            if coding in accepted and os.path.isfile(full_path + suffix):
+                encoding = coding
+                full_path += suffix
+                break
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(mtime)
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = IMMUTABLE if HASHED_NAME.search(path) else REVALIDATE
+    return response
@@ -0,0 +1,39 @@
+import os
+
+from django.template import TemplateSyntaxError, engines
+
+
+def project_template_names(engine=None):
+    """Names of every template file in the engine's ``DIRS`` (the project ``templates/``)."""
+    engine = engine or engines['django'].engine
+    names = []
+    for directory in engine.dirs:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith(('.html', '.txt')):
+                    names.append(os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def preload_templates(names=None):
+    """Compile templates into the cached loader and return ``(loaded, errors)``.
+
+    ``errors`` maps template names to the syntax error that stopped them
+    compiling. Templates they extend or include are compiled along with them.
+    """
+    engine = engines['django'].engine
+    loaded, errors = [], {}
+    for name in names or project_template_names(engine):
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError as error:
+            errors[name] = error
+        else:
+            loaded.append(name)
+    return loaded, errors
+
+
+def uses_cached_loader():
+    engine = engines['django'].engine
+    return any(type(loader).__module__ == 'django.template.loaders.cached' for loader in engine.template_loaders)
+
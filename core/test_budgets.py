@@ -0,0 +1,175 @@
+import datetime
+import json
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Item, Order, OrderItem, Promotion
+from core.search import get_search_backend
+from core.testing import BudgetMixin
+
+# Catalog and cart sizes every route is measured at
+SIZES = (1, 10, 100)
+
+# Maximum queries and wall-clock milliseconds per request, for every size.
+# Query budgets do not grow with the size: a per-row query would blow them at 100.
+BUDGETS = {
+    'home': (4, 250),
+    'home search': (5, 250),
+    'home filtered': (5, 250),
+    'product': (3, 150),
+    'promotions': (4, 150),
+    'autocomplete': (3, 100),
+    'order-summary': (5, 400),
+    'checkout': (4, 400),
+    'checkout POST': (7, 250),
+    'add-to-cart': (7, 150),
+    'remove-single-item-from-cart': (7, 150),
+    'remove-from-cart': (8, 150),
+    'update-cart': (9, 300),
+    'order-history': (3, 300),
+    'order-detail': (4, 300),
+    'reschedule-order': (3, 150),
+    'account': (4, 150),
+    'complete-profile': (2, 150),
+}
+
+CHECKOUT_FORM = {
+    'address1': '1 Main St',
+    'country': 'Canada',
+    'state': 'Ontario',
+    'zip_code': 'M1A 1A1',
+    'payment_type': 'credit',
+    'name_on_card': 'Budget Test',
+    'card_number': '4111111111111111',
+    'expiration': '12/2030',
+    'cvv': '123',
+    'delivery_date': '2030-01-01',
+    'delivery_timeslot': '9am-12pm',
+}
+
+
+class ViewBudgetTestCase(BudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='budgetuser', password='testpass123')
+        self.client.login(username='budgetuser', password='testpass123')
+
+    def build(self, size):
+        """A catalog of ``size`` items (half on promotion), a cart and a placed order
+        of ``size`` lines each, and ``size`` orders in the history.
+
+        The cart also holds one spare item for remove-from-cart.
+        """
+        Order.objects.all().delete()
+        Item.objects.all().delete()
+        Promotion.objects.all().delete()
+
+        items = Item.objects.bulk_create(
+            Item(
+                name=f'Budget Item {n}',
+                slug=f'budget-{n}',
+                price=Decimal('2.50'),
+                category='fruits' if n % 2 else 'vegetables',
+                labels='organic',
+                description='Fresh produce',
+            )
+            for n in range(size)
+        )
+        # One more line in the cart, for remove-from-cart to take out
+        spare = Item.objects.create(name='Spare Item', slug='budget-spare', price=Decimal('1.00'))
+        get_search_backend().rebuild()
+        promotion = Promotion.objects.create(
+            title='Half the catalog',
+            description='Budget promotion',
+            start_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=1),
+            discount_rate=Decimal('10.00'),
+        )
+        promotion.products.add(*items[::2])
+
+        cart = Order.objects.create(user=self.user, slug='budget-cart')
+        placed = [
+            Order(user=self.user, slug=f'budget-placed-{n}', is_ordered=True, ordered_date=timezone.now())
+            for n in range(size)
+        ]
+        placed = Order.objects.bulk_create(placed)
+        lines = [OrderItem(order=cart, user=self.user, item=item, quantity=2) for item in items + [spare]]
+        lines += [OrderItem(order=placed[0], user=self.user, item=item, quantity=1) for item in items]
+        lines += [OrderItem(order=order, user=self.user, item=items[0], quantity=1) for order in placed[1:]]
+        OrderItem.objects.bulk_create(lines)
+        cache.clear()
+        return items, cart, placed[0]
+
+    def requests(self, items, cart, placed):
+        """(label, method, path, data) for every view, in an order that keeps the cart usable."""
+        item = items[-1]
+        return [
+            ('home', 'GET', reverse('core:home'), None),
+            ('home search', 'GET', reverse('core:home'), {'q': 'budget item'}),
+            ('home filtered', 'GET', reverse('core:home'), {'category': 'fruits', 'labels': 'organic', 'sort': 'price-asc'}),
+            ('product', 'GET', reverse('core:product', kwargs={'slug': item.slug}), None),
+            ('promotions', 'GET', reverse('core:promotions'), None),
+            ('autocomplete', 'GET', reverse('core:autocomplete'), {'q': 'bud'}),
+            ('order-summary', 'GET', reverse('core:order-summary'), None),
+            ('checkout', 'GET', reverse('core:checkout-page'), None),
+            ('add-to-cart', 'GET', reverse('core:add-to-cart', kwargs={'slug': item.slug}), None),
+            ('remove-single-item-from-cart', 'GET',
+             reverse('core:remove-single-item-from-cart', kwargs={'slug': item.slug}), None),
+            ('update-cart', 'JSON', reverse('core:update-cart'), {i.slug: 3 for i in items}),
+            ('remove-from-cart', 'GET', reverse('core:remove-from-cart', kwargs={'slug': 'budget-spare'}), None),
+            ('checkout POST', 'POST', reverse('core:checkout-page'), CHECKOUT_FORM),
+            ('order-history', 'GET', reverse('core:order-history'), None),
+            ('order-detail', 'GET', reverse('core:order-detail', kwargs={'slug': placed.slug}), None),
+            ('reschedule-order', 'GET', reverse('core:reschedule-order', kwargs={'slug': placed.slug}), None),
+            ('account', 'GET', reverse('core:account'), None),
+            ('complete-profile', 'GET', reverse('core:complete_profile'), None),
+        ]
+
+    def send(self, method, path, data):
+        if method == 'JSON':
+            return self.client.post(path, json.dumps(data), content_type='application/json')
+        if method == 'POST':
+            return self.client.post(path, data)
+        return self.client.get(path, data or {})
+
+    # Every view stays within its query and time budget at every size
+    def test_view_budgets(self):
+        self.assertEqual(
+            set(BUDGETS), {label for label, *_ in self.requests([Item(slug='x')], Order(), Order(slug='x'))}
+        )
+        for size in SIZES:
+            items, cart, placed = self.build(size)
+            # Warm the per-process caches the way a running server would have
+            self.client.get(reverse('core:home'))
+            for label, method, path, data in self.requests(items, cart, placed):
+                queries, ms = BUDGETS[label]
+                with self.subTest(view=label, size=size):
+                    with self.assertWithinBudget(queries=queries, ms=ms, label=f'{label} ({size} rows)'):
+                        response = self.send(method, path, data)
+                    self.assertLess(response.status_code, 400)
+
+
+class BudgetHelperTestCase(BudgetMixin, TestCase):
+    # A blown budget fails with the offending SQL, repeated statements first
+    def test_failure_report(self):
+        Item.objects.create(name='Apple', price=Decimal('1.00'), slug='apple')
+        with self.assertRaises(AssertionError) as raised:
+            with self.assertWithinBudget(queries=1, label='n+1'):
+                for _ in range(3):
+                    list(Item.objects.filter(slug='apple'))
+        report = str(raised.exception)
+        self.assertIn('n+1: 3 queries, budget 1', report)
+        self.assertIn('Repeated queries:', report)
+        self.assertIn('3x SELECT', report)
+        self.assertIn('"core_item"."slug" = \'apple\'', report)
+
+    # Staying within budget passes and exposes the measurements
+    def test_within_budget(self):
+        with self.assertWithinBudget(queries=1, ms=1000) as context:
+            Item.objects.count()
+        self.assertEqual(len(context), 1)
+        self.assertLess(context.elapsed_ms, 1000)
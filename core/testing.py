@@ -0,0 +1,71 @@
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from .cache import cache_settings
+
+# Wall-clock budgets are multiplied by this, for slow CI machines
+TIME_SCALE = float(os.environ.get('PERF_BUDGET_TIME_SCALE', '1'))
+
+
+def format_budget_report(label, problems, queries):
+    """Describe a blown budget: what was exceeded, then every query that ran."""
+    lines = [f'{label}: ' + '; '.join(problems)]
+    repeated = [(sql, count) for sql, count in Counter(q['sql'] for q in queries).items() if count > 1]
+    if repeated:
+        lines.append('Repeated queries:')
+        lines += [f'  {count}x {sql}' for sql, count in repeated]
+    lines.append('Queries:')
+    lines += [f'  {n}. ({float(q["time"]) * 1000:.1f} ms) {q["sql"]}' for n, q in enumerate(queries, 1)]
+    return '\n'.join(lines)
+
+
+class BudgetMixin:
+    """TestCase mixin asserting that a block stays within a query and time budget.
+
+    Example::
+
+        with self.assertWithinBudget(queries=4, ms=200, label='home'):
+            self.client.get('/')
+
+    A failure lists every query run in the block, repeated ones first, so an
+    N+1 shows up in the test output.
+    """
+
+    @contextmanager
+    def assertWithinBudget(self, queries=None, ms=None, label='block'):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        context.elapsed_ms = elapsed_ms
+
+        problems = []
+        if queries is not None and len(context) > queries:
+            problems.append(f'{len(context)} queries, budget {queries}')
+        if ms is not None and elapsed_ms > ms * TIME_SCALE:
+            problems.append(f'{elapsed_ms:.0f} ms, budget {ms * TIME_SCALE:.0f} ms')
+        if problems:
+            self.fail(format_budget_report(label, problems, context.captured_queries))
+
+
+class LocMemCacheTestRunner(DiscoverRunner):
+    """Test runner that swaps the configured cache store for a private locmem one.
+
+    Tests never touch the file or Redis store of the machine they run on,
+    whichever way the runner is started.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_override = override_settings(CACHES=cache_settings('locmem', 'tests'))
+        self._cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -6,9 +6,46 @@ from core.models import (
     Item, Order, OrderItem, Address, Payment, 
     UserProfile, Promotion
 )
+from core.promotions import get_promotion_index
+from django.core.cache import cache
 from django.utils import timezone
 from decimal import Decimal
+from unittest import mock
 import datetime
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.contrib.sessions.backends.cached_db import KEY_PREFIX
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import caches
+from django.core.signals import request_finished, request_started
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory
+from django.utils.log import configure_logging
+from benchmarks.middleware import LegacyPreventAutoLoginMiddleware, login_session, measure
+from benchmarks.runner import compare, percentile, run
+from core.assets import Tokens, scan_template, trim_css
+from core.cache import NAMESPACES, FileBasedCache, _backends, cache_settings, flush_all_stats
+from core.fragments import get_sidebar_version
+from core.instrumentation import RequestMetrics
+from core.logs import Lazy
+from core.middleware import PreventAutoLoginMiddleware
+from core.pagecache import anonymous_page_cache, page_cache_timeout
+import gc
+import gzip
+import logging
+import logging.config
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import weakref
 
 class PromotionsViewTestCase(TestCase):
     def setUp(self):
@@ -544,4 +581,1248 @@ class AccountEditTestCase(TestCase):
             'phone': '1234567890'
         })
         self.assertEqual(response.status_code, 200)
-        self.assertContains(response, 'Enter a valid email address.')
\ No newline at end of file
+        self.assertContains(response, 'Enter a valid email address.')
+
+class DiscountEngineTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='engineuser', password='testpass123')
+        self.order = Order.objects.create(user=self.user, is_ordered=False)
+
+        self.promotions = []
+        for n in range(3):
+            promo = Promotion.objects.create(
+                title=f'Promo {n}',
+                description='Test promotion',
+                start_date=timezone.now() - datetime.timedelta(days=1),
+                end_date=timezone.now() + datetime.timedelta(days=1),
+                discount_rate=Decimal('10.00') * (n + 1),
+                is_active=True
+            )
+            self.promotions.append(promo)
+
+        for n in range(6):
+            item = Item.objects.create(
+                name=f'Item {n}',
+                price=Decimal('2.00'),
+                slug=f'item-{n}',
+            )
+            if n < 3:
+                self.promotions[n].products.add(item)
+            order_item = OrderItem.objects.create(
+                item=item, user=self.user, quantity=2, ordered=False, order_id=self.order.id
+            )
+            self.order.items.add(order_item)
+
+    # Totals match the per-line promotion rates
+    def test_discount_totals(self):
+        data = self.order.calculate_discounts()
+
+        # 6 lines x 2 x $2.00 = $24.00; discounts 10%, 20% and 30% of $4.00
+        self.assertEqual(data['original_total'], Decimal('24.00'))
+        self.assertEqual(data['total_discount'], Decimal('2.40'))
+        self.assertEqual(data['discounted_total'], Decimal('21.60'))
+        self.assertEqual(len(data['applied_promotions']), 3)
+
+    # Expired and inactive promotions are ignored
+    def test_inactive_promotions_ignored(self):
+        self.promotions[0].is_active = False
+        self.promotions[0].save()
+        self.promotions[1].end_date = timezone.now() - datetime.timedelta(hours=1)
+        self.promotions[1].save()
+
+        data = self.order.calculate_discounts()
+        self.assertEqual(data['total_discount'], Decimal('1.20'))
+        self.assertEqual([entry['promotion'] for entry in data['applied_promotions']], [self.promotions[2]])
+
+    # Query count does not grow with the number of lines or promotions
+    def test_fixed_query_count(self):
+        # Cart lines + promotion index (promotions, products)
+        with self.assertNumQueries(3):
+            self.order.calculate_discounts()
+
+        # The promotion index is cached, only the cart lines are read
+        order = Order.objects.get(pk=self.order.pk)
+        with self.assertNumQueries(1):
+            order.calculate_discounts()
+            for order_item in order.items.all():
+                order_item.get_final_price()
+
+    # Totals are computed once per order instance until the cart changes
+    def test_pricing_is_memoized(self):
+        order = Order.objects.get(pk=self.order.pk)
+        get_promotion_index()
+        with self.assertNumQueries(1):
+            order.get_final_price()
+            order.get_total_cost()
+            order.get_taxes()
+            order.get_original_total_cost()
+            order.get_total_count()
+            order.calculate_discounts()
+
+        order_item = order.items.first()
+        order_item.quantity += 1
+        order_item.save()
+        order.invalidate_pricing()
+        self.assertEqual(order.get_total_count(), 13)
+        self.assertEqual(order.get_original_total_cost(), Decimal('26.00'))
+
+    # Checkout renders with a fixed number of queries
+    def test_checkout_query_count(self):
+        self.client.login(username='engineuser', password='testpass123')
+        self.client.get(reverse('core:checkout-page'))
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('core:checkout-page'))
+        self.assertContains(response, '$21.60')
+
+
+class PromotionIndexTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.apple = Item.objects.create(name='Apple', price=Decimal('5.00'), slug='apple')
+        self.pear = Item.objects.create(name='Pear', price=Decimal('4.00'), slug='pear')
+        self.promo = Promotion.objects.create(
+            title='Fruits Sale',
+            description='20% off all fruits',
+            start_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=7),
+            discount_rate=Decimal('20.00'),
+        )
+        self.promo.products.add(self.apple)
+
+    # The index is served from the cache once built
+    def test_index_is_cached(self):
+        get_promotion_index()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.apple.get_discounted_price(), (Decimal('4.00'), Decimal('20.00')))
+            self.assertEqual(self.pear.get_discounted_price(), (None, None))
+
+    # The highest discount wins when promotions overlap
+    def test_best_promotion_wins(self):
+        better = Promotion.objects.create(
+            title='Apple Day',
+            description='Half price apples',
+            start_date=timezone.now() - datetime.timedelta(hours=1),
+            end_date=timezone.now() + datetime.timedelta(hours=1),
+            discount_rate=Decimal('50.00'),
+        )
+        better.products.add(self.apple)
+        self.assertEqual(get_promotion_index().promotion_for(self.apple.pk), better)
+
+    # Saving a promotion or changing its products rebuilds the index
+    def test_signals_invalidate_index(self):
+        get_promotion_index()
+        self.promo.products.add(self.pear)
+        self.assertEqual(get_promotion_index().promotion_for(self.pear.pk), self.promo)
+
+        self.promo.is_active = False
+        self.promo.save()
+        self.assertIsNone(get_promotion_index().promotion_for(self.apple.pk))
+
+    # Crossing a start/end date boundary rebuilds the index
+    def test_rebuilt_after_boundary(self):
+        upcoming = Promotion.objects.create(
+            title='Pear Week',
+            description='Pears on sale',
+            start_date=timezone.now() + datetime.timedelta(hours=1),
+            end_date=timezone.now() + datetime.timedelta(days=2),
+            discount_rate=Decimal('10.00'),
+        )
+        upcoming.products.add(self.pear)
+        index = get_promotion_index()
+        self.assertIsNone(index.promotion_for(self.pear.pk))
+        self.assertEqual(index.valid_until, upcoming.start_date)
+
+        later = upcoming.start_date + datetime.timedelta(minutes=1)
+        with mock.patch('core.promotions.timezone.now', return_value=later):
+            self.assertEqual(get_promotion_index().promotion_for(self.pear.pk), upcoming)
+
+    # The cached index holds item ids and rates, not the promotions' item rows
+    def test_index_stays_small(self):
+        items = Item.objects.bulk_create(
+            [Item(name=f'Item {n}', price=Decimal('1.00'), slug=f'item-{n}') for n in range(500)]
+        )
+        self.promo.products.add(*items)
+        index = get_promotion_index()
+        self.assertEqual(index.by_item[items[0].pk], (self.promo.pk, Decimal('20.00')))
+        self.assertFalse(hasattr(index.promotion_for(items[0].pk), '_prefetched_objects_cache'))
+        self.assertLess(len(pickle.dumps(index)), 10_000)
+
+    # Within a request the index is read from the cache only once
+    def test_memoized_per_request(self):
+        self.assertIsNot(get_promotion_index(), get_promotion_index())
+        request_started.send(sender=None)
+        try:
+            index = get_promotion_index()
+            self.assertIs(get_promotion_index(), index)
+            self.promo.products.add(self.pear)
+            self.assertEqual(get_promotion_index().promotion_for(self.pear.pk), self.promo)
+        finally:
+            request_finished.send(sender=None)
+        self.assertIsNot(get_promotion_index(), get_promotion_index())
+
+
+class CatalogDiscountTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.apple = Item.objects.create(name='Apple', price=Decimal('5.00'), slug='apple', category='fruits')
+        self.carrot = Item.objects.create(name='Carrot', price=Decimal('3.50'), slug='carrot', category='vegetables')
+        self.melon = Item.objects.create(name='Melon', price=Decimal('6.00'), slug='melon', category='fruits')
+        promo = Promotion.objects.create(
+            title='Melon Madness',
+            description='Half price melons',
+            start_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=1),
+            discount_rate=Decimal('50.00'),
+        )
+        promo.products.add(self.melon)
+
+    # Discount rate and price are annotated on every row
+    def test_with_active_discount_annotations(self):
+        items = {item.slug: item for item in Item.objects.with_active_discount()}
+        self.assertEqual(items['melon'].active_discount_rate, Decimal('50'))
+        self.assertEqual(items['melon'].effective_price, Decimal('3.00'))
+        self.assertIsNone(items['apple'].active_discount_rate)
+        self.assertEqual(items['apple'].effective_price, Decimal('5.00'))
+        with self.assertNumQueries(0):
+            self.assertEqual(items['melon'].get_discounted_price(), (Decimal('3.00'), Decimal('50.00')))
+
+    # Price sorting uses the discounted price
+    def test_sort_by_effective_price(self):
+        response = self.client.get(reverse('core:home') + '?sort=price-asc')
+        self.assertEqual([item.slug for item in response.context['object_list']], ['melon', 'carrot', 'apple'])
+
+        response = self.client.get(reverse('core:home') + '?sort=price-desc')
+        self.assertEqual([item.slug for item in response.context['object_list']], ['apple', 'carrot', 'melon'])
+
+    # The home page prices every card without per-item queries
+    def test_home_page_query_count(self):
+        self.client.get(reverse('core:home'))
+        for n in range(10):
+            Item.objects.create(name=f'Extra {n}', price=Decimal('1.00'), slug=f'extra-{n}')
+        # Page count, facets and the promotion index (both rebuilt after the item writes), items
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('core:home'))
+        self.assertContains(response, '$3.00')
+
+
+class CatalogPaginationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        for n in range(30):
+            Item.objects.create(
+                name=f'Item {n}',
+                price=Decimal(n % 7) + Decimal('0.50'),
+                slug=f'item-{n}',
+                category='fruits' if n % 2 else 'vegetables',
+            )
+
+    def collect_keyset(self, params):
+        """Follow next cursors from the first page and return all slugs seen."""
+        slugs = []
+        response = self.client.get(reverse('core:home'), {**params, 'cursor': ''})
+        while True:
+            page = response.context['page_obj']
+            slugs += [item.slug for item in page.object_list]
+            if not page.has_next():
+                return slugs, response
+            response = self.client.get(reverse('core:home'), {**params, 'cursor': page.next_cursor})
+
+    # Offset pages are limited to the page size and keep the filters
+    def test_offset_pagination(self):
+        response = self.client.get(reverse('core:home'), {'category': 'fruits', 'page': 1})
+        self.assertEqual(len(response.context['object_list']), 15)
+
+        response = self.client.get(reverse('core:home'))
+        self.assertEqual(len(response.context['object_list']), 24)
+        self.assertContains(response, 'href="?page=2"')
+
+    # Keyset pages cover the full listing in order without duplicates
+    def test_keyset_pagination_matches_sorted_listing(self):
+        for sort in ('price-asc', 'price-desc', None):
+            params = {'sort': sort} if sort else {}
+            slugs, _ = self.collect_keyset(params)
+            expected = Item.objects.with_active_discount().order_by(
+                *{'price-asc': ['effective_price', 'id'], 'price-desc': ['-effective_price', 'id']}.get(sort, ['id'])
+            ).values_list('slug', flat=True)
+            self.assertEqual(slugs, list(expected))
+
+    # The previous cursor returns to the page before
+    def test_keyset_previous_cursor(self):
+        first = self.client.get(reverse('core:home'), {'sort': 'price-asc', 'cursor': ''}).context['page_obj']
+        second = self.client.get(
+            reverse('core:home'), {'sort': 'price-asc', 'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertFalse(first.has_previous())
+        self.assertFalse(second.has_next())
+
+        back = self.client.get(
+            reverse('core:home'), {'sort': 'price-asc', 'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back.object_list), list(first.object_list))
+        self.assertFalse(back.has_previous())
+
+    # A tampered cursor is a 404, not a server error
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('core:home'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class CatalogSearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.apple = Item.objects.create(
+            name='Apple', price=Decimal('1.00'), slug='apple', category='fruits',
+            description='Crisp red fruit',
+        )
+        self.pie = Item.objects.create(
+            name='Pie', price=Decimal('8.00'), slug='pie', category='bakery',
+            description='Baked with apple and cinnamon',
+        )
+        self.carrot = Item.objects.create(
+            name='Carrot', price=Decimal('0.50'), slug='carrot', category='vegetables',
+            description='Orange root vegetable',
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('core:home'), {'q': query, **params})
+        return [item.slug for item in response.context['object_list']]
+
+    # Name matches rank above description matches
+    def test_results_ranked_by_relevance(self):
+        self.assertEqual(self.search('apple'), ['apple', 'pie'])
+
+    # Words match as prefixes and every word must match
+    def test_prefix_and_multi_word(self):
+        self.assertEqual(self.search('carr'), ['carrot'])
+        self.assertEqual(self.search('apple cinnamon'), ['pie'])
+        self.assertEqual(self.search('!!!'), [])
+
+    # An explicit sort still overrides relevance
+    def test_sort_with_search(self):
+        self.assertEqual(self.search('apple', sort='price-desc'), ['pie', 'apple'])
+
+    # The index follows item saves and deletes
+    def test_index_kept_in_sync(self):
+        self.carrot.name = 'Parsnip'
+        self.carrot.save()
+        self.assertEqual(self.search('carrot'), [])
+        self.assertEqual(self.search('parsnip'), ['carrot'])
+
+        self.apple.delete()
+        self.assertEqual(self.search('apple'), ['pie'])
+
+    # Keyset pages over search results follow relevance order
+    def test_keyset_search(self):
+        response = self.client.get(reverse('core:home'), {'q': 'apple', 'cursor': ''})
+        self.assertEqual([item.slug for item in response.context['page_obj'].object_list], ['apple', 'pie'])
+
+
+class CatalogFacetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        Item.objects.create(name='Apple', price=Decimal('1.00'), slug='apple', category='fruits', labels='organic')
+        Item.objects.create(name='Pear', price=Decimal('1.00'), slug='pear', category='fruits', labels='vegan')
+        Item.objects.create(name='Kale', price=Decimal('2.00'), slug='kale', category='vegetables', labels='organic')
+        Item.objects.create(name='Leek', price=Decimal('2.00'), slug='leek', category='vegetables')
+
+    def facets(self, params=None):
+        context = self.client.get(reverse('core:home'), params or {}).context
+        return (
+            {key: count for key, _, count in context['categories']},
+            {key: count for key, _, count in context['labels']},
+        )
+
+    # Unfiltered counts cover the whole catalog
+    def test_unfiltered_counts(self):
+        categories, labels = self.facets()
+        self.assertEqual(categories, {'fruits': 2, 'vegetables': 2})
+        self.assertEqual(labels, {'organic': 2, 'vegan': 1})
+
+    # Each facet respects the search and the other facet's selection
+    def test_filtered_counts(self):
+        categories, labels = self.facets({'labels': 'organic'})
+        self.assertEqual(categories, {'fruits': 1, 'vegetables': 1})
+        self.assertEqual(labels, {'organic': 2, 'vegan': 1})
+
+        categories, labels = self.facets({'category': 'fruits'})
+        self.assertEqual(categories, {'fruits': 2, 'vegetables': 2})
+        self.assertEqual(labels, {'organic': 1, 'vegan': 1})
+
+        categories, labels = self.facets({'q': 'kale'})
+        self.assertEqual(categories, {'vegetables': 1})
+        self.assertEqual(labels, {'organic': 1})
+
+    # The landing page reuses cached facets until an item changes
+    def test_unfiltered_facets_cached(self):
+        with self.settings(PAGE_CACHE_TIMEOUT=0):
+            self.client.get(reverse('core:home'))
+            # Page count and items only
+            with self.assertNumQueries(2):
+                self.client.get(reverse('core:home'))
+
+        Item.objects.create(name='Plum', price=Decimal('1.00'), slug='plum', category='fruits')
+        categories, _ = self.facets()
+        self.assertEqual(categories['fruits'], 3)
+
+
+class AutocompleteTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.beans = Item.objects.create(name='Green Beans', price=Decimal('3.00'), slug='green-beans')
+        Item.objects.create(name='Sweet Green Peppers', price=Decimal('4.00'), slug='sweet-green-peppers')
+        Item.objects.create(name='Jalapeño', price=Decimal('1.00'), slug='jalapeno')
+        promo = Promotion.objects.create(
+            title='Bean Week',
+            description='Beans on sale',
+            start_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=1),
+            discount_rate=Decimal('10.00'),
+        )
+        promo.products.add(self.beans)
+
+    def suggest(self, query, **params):
+        response = self.client.get(reverse('core:autocomplete'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    # Whole-name prefixes rank above later-word prefixes
+    def test_prefix_matches(self):
+        results = self.suggest('gre')
+        self.assertEqual([r['slug'] for r in results], ['green-beans', 'sweet-green-peppers'])
+        self.assertEqual(results[0]['price'], '3.00')
+        self.assertEqual(results[0]['discounted_price'], '2.70')
+        self.assertEqual(results[0]['url'], reverse('core:product', kwargs={'slug': 'green-beans'}))
+        self.assertEqual([r['slug'] for r in self.suggest('jalapeno')], ['jalapeno'])
+        self.assertEqual([r['slug'] for r in self.suggest('gre', limit=1)], ['green-beans'])
+        self.assertEqual(self.suggest(''), [])
+
+    # Keystrokes after the first are served without database queries
+    def test_no_queries_when_warm(self):
+        self.suggest('gre')
+        with self.assertNumQueries(0):
+            self.suggest('green b')
+
+    # Item writes rebuild the index
+    def test_rebuilt_on_item_change(self):
+        self.suggest('gre')
+        Item.objects.create(name='Grapes', price=Decimal('2.00'), slug='grapes')
+        self.assertEqual([r['slug'] for r in self.suggest('gr')][0], 'grapes')
+        self.beans.delete()
+        self.assertNotIn('green-beans', [r['slug'] for r in self.suggest('gre')])
+
+
+class CartMutationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cartuser', password='testpass123')
+        self.client.login(username='cartuser', password='testpass123')
+        self.apple = Item.objects.create(name='Apple', price=Decimal('1.00'), slug='apple')
+        self.carrot = Item.objects.create(name='Carrot', price=Decimal('0.50'), slug='carrot')
+
+    def cart_lines(self):
+        order = Order.objects.get(user=self.user, is_ordered=False)
+        return {line.item.slug: line.quantity for line in order.items.all()}
+
+    def post(self, name, item):
+        return self.client.get(reverse(f'core:{name}', kwargs={'slug': item.slug}))
+
+    # Repeated adds bump a single line
+    def test_add_increments_one_line(self):
+        for _ in range(3):
+            self.post('add-to-cart', self.apple)
+        self.post('add-to-cart', self.carrot)
+        self.assertEqual(self.cart_lines(), {'apple': 3, 'carrot': 1})
+        self.assertEqual(OrderItem.objects.filter(item=self.apple).count(), 1)
+
+    # The message reports the quantity in the database, including concurrent adds
+    def test_add_reports_current_total(self):
+        self.post('add-to-cart', self.apple)
+        # Another request adds one
+        OrderItem.objects.filter(item=self.apple).update(quantity=2)
+        response = self.post('add-to-cart', self.apple)
+        self.assertEqual(self.cart_lines(), {'apple': 3})
+        self.assertIn('Total: 3', str(list(get_messages(response.wsgi_request))[-1]))
+
+    # A line created by another request after the update found none is still incremented
+    def test_add_racing_create(self):
+        self.post('add-to-cart', self.carrot)
+        get_or_create = OrderItem.objects.get_or_create
+
+        def racing(*args, **kwargs):
+            get_or_create(*args, **kwargs)
+            return get_or_create(*args, **kwargs)
+
+        with mock.patch.object(OrderItem.objects, 'get_or_create', side_effect=racing):
+            self.post('add-to-cart', self.apple)
+        self.assertEqual(self.cart_lines(), {'apple': 2, 'carrot': 1})
+
+    # Decrement removes the line at zero, remove drops it outright
+    def test_decrement_and_remove(self):
+        self.post('add-to-cart', self.apple)
+        self.post('add-to-cart', self.apple)
+        self.post('add-to-cart', self.carrot)
+
+        self.post('remove-single-item-from-cart', self.apple)
+        self.assertEqual(self.cart_lines(), {'apple': 1, 'carrot': 1})
+        self.post('remove-single-item-from-cart', self.apple)
+        self.assertEqual(self.cart_lines(), {'carrot': 1})
+
+        self.post('remove-from-cart', self.carrot)
+        self.assertFalse(Order.objects.filter(user=self.user, is_ordered=False).exists())
+
+    # Removing from the cart leaves lines of placed orders alone
+    def test_remove_keeps_placed_orders(self):
+        self.post('add-to-cart', self.apple)
+        Order.objects.filter(user=self.user).update(is_ordered=True)
+        self.post('add-to-cart', self.apple)
+        self.post('remove-from-cart', self.apple)
+        self.assertEqual(OrderItem.objects.filter(item=self.apple).count(), 1)
+
+    # A cart cannot hold two lines for the same item
+    def test_unique_line_per_order(self):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(item=self.apple, user=self.user, order_id=order.id)
+        with self.assertRaises(IntegrityError):
+            OrderItem.objects.create(item=self.apple, user=self.user, order_id=order.id)
+
+    # Each cart operation runs a fixed number of queries
+    def test_query_budget(self):
+        # Every request: user, item lookup, plus the transaction savepoint pair (the session is cached)
+        budgets = [
+            ('add-to-cart', self.apple, 13),  # opens the cart (in a savepoint), increment miss, creates the line
+            ('add-to-cart', self.apple, 7),  # cart, increment, read the quantity for the message
+            ('add-to-cart', self.carrot, 10),  # increment miss, new line in the existing cart
+            ('remove-single-item-from-cart', self.apple, 6),  # cart, decrement
+            ('remove-single-item-from-cart', self.apple, 7),  # cart, decrement miss, delete line
+            ('remove-from-cart', self.carrot, 9),  # cart, delete line, delete the emptied cart
+        ]
+        for name, item, queries in budgets:
+            with self.subTest(name=name, item=item.slug), self.assertNumQueries(queries):
+                self.post(name, item)
+
+
+class BulkCartUpdateTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bulkuser', password='testpass123')
+        self.client.login(username='bulkuser', password='testpass123')
+        self.items = [
+            Item.objects.create(name=f'Item {n}', price=Decimal('2.00'), slug=f'item-{n}') for n in range(4)
+        ]
+        self.order = Order.objects.create(user=self.user)
+        for item in self.items[:2]:
+            line = OrderItem.objects.create(item=item, user=self.user, quantity=1, order_id=self.order.id)
+            self.order.items.add(line)
+
+    def update(self, changes):
+        return self.client.post(reverse('core:update-cart'), json.dumps(changes), content_type='application/json')
+
+    # Creates, updates and deletes lines in one request and returns the totals
+    def test_bulk_update(self):
+        response = self.update({'item-0': 0, 'item-1': 12, 'item-2': 3, 'item-3': 0})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual({line['slug']: line['quantity'] for line in data['lines']}, {'item-1': 12, 'item-2': 3})
+        self.assertEqual(data['total_count'], 15)
+        self.assertEqual(data['total_cost'], '30.00')
+        self.assertEqual(data['final_price'], '33.90')
+        self.assertEqual(
+            {line.item.slug: line.quantity for line in self.order.items.all()}, {'item-1': 12, 'item-2': 3}
+        )
+
+    # Bad payloads are rejected without touching the cart
+    def test_invalid_payloads(self):
+        self.assertEqual(self.update({'item-0': -1}).status_code, 400)
+        self.assertEqual(self.update(['item-0']).status_code, 400)
+        response = self.update({'item-0': 2, 'nope': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['unknown'], ['nope'])
+        self.assertEqual(OrderItem.objects.get(item=self.items[0]).quantity, 1)
+        self.assertEqual(self.client.get(reverse('core:update-cart')).status_code, 405)
+        # Above the per-line maximum
+        self.assertEqual(self.update({'item-0': 2 ** 40}).status_code, 400)
+        self.assertEqual(OrderItem.objects.get(item=self.items[0]).quantity, 1)
+        # Only JSON integers are quantities
+        for quantity in (2.9, True, '3', None, [1]):
+            with self.subTest(quantity=quantity):
+                self.assertEqual(self.update({'item-0': quantity}).status_code, 400)
+        response = self.client.post(reverse('core:update-cart'), '{"item-0": 1e999}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(OrderItem.objects.get(item=self.items[0]).quantity, 1)
+
+    # An empty payload creates no cart
+    def test_empty_payload(self):
+        self.order.delete()
+        self.assertEqual(self.update({}).status_code, 400)
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+
+    # Setting every line to 0 deletes the cart, like remove_from_cart
+    def test_emptied_cart_deleted(self):
+        response = self.update({'item-0': 0, 'item-1': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['lines'], [])
+        self.assertFalse(Order.objects.filter(pk=self.order.pk).exists())
+
+    # The query count does not grow with the size of the batch
+    def test_query_count_independent_of_batch(self):
+        changes = {item.slug: 5 for item in self.items}
+        extra = [Item.objects.create(name=f'Extra {n}', price=Decimal('1.00'), slug=f'extra-{n}') for n in range(10)]
+        changes.update({item.slug: 2 for item in extra})
+        self.update({'item-0': 1})
+        # User, items, cart, lines, savepoint pair, bulk update, bulk create,
+        # priced lines (the session is cached)
+        with self.assertNumQueries(9):
+            self.update(changes)
+
+
+class QueryPlanCommandTestCase(TestCase):
+    # Every hot query is served by an index on a seeded dataset
+    def test_no_full_scans(self):
+        out = StringIO()
+        call_command('checkqueryplans', seed=200, stdout=out)
+        self.assertIn('No hot query plans a full table scan', out.getvalue())
+        # The seeded rows are rolled back
+        self.assertFalse(Item.objects.exists())
+
+    # An empty database is reported rather than silently passing
+    def test_requires_data(self):
+        with self.assertRaises(CommandError):
+            call_command('checkqueryplans')
+
+    # A second open cart for the same user is rejected
+    def test_one_open_cart_per_user(self):
+        user = User.objects.create_user(username='cartowner', password='testpass123')
+        Order.objects.create(user=user, slug='cart-1')
+        Order.objects.create(user=user, slug='placed-1', is_ordered=True)
+        with self.assertRaises(IntegrityError):
+            Order.objects.create(user=user, slug='cart-2')
+
+
+class PrepopulateCommandTestCase(TestCase):
+    def prepopulate(self, **options):
+        options = {'items': 30, 'users': 5, 'promotions': 4, 'seed': 7, 'batch_size': 8, **options}
+        call_command('prepopulate', stdout=StringIO(), **options)
+        return list(Item.objects.order_by('slug').values_list('slug', 'name', 'price'))
+
+    # Creates every kind of row, in batches
+    def test_creates_dataset(self):
+        self.prepopulate()
+        self.assertEqual(Item.objects.count(), 30)
+        self.assertEqual(Promotion.objects.count(), 4)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(UserProfile.objects.count(), 5)
+        self.assertEqual(Order.objects.count(), 15)
+        self.assertTrue(OrderItem.objects.exists())
+        self.assertTrue(Order.objects.filter(is_ordered=True, address__isnull=False).exists())
+        # Bulk-created items are searchable
+        name = Item.objects.first().name
+        response = self.client.get(reverse('core:home'), {'q': name})
+        self.assertIn(name, [item.name for item in response.context['object_list']])
+
+    # The same seed reproduces the same rows
+    def test_deterministic(self):
+        first = self.prepopulate()
+        second = self.prepopulate(clear=True)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, self.prepopulate(clear=True, seed=8))
+
+    # A second run without --clear stops before inserting anything
+    def test_refuses_to_duplicate(self):
+        self.prepopulate()
+        with self.assertRaisesMessage(CommandError, '--clear'):
+            self.prepopulate(seed=8)
+        self.assertEqual(Item.objects.count(), 30)
+
+
+class BenchmarkRunnerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command('prepopulate', items=20, users=2, promotions=2, stdout=StringIO())
+
+    # Every journey runs in-process and is reported per route
+    def test_in_process_run(self):
+        report = run(['browse', 'purchase'], concurrency=1, iterations=1)
+        self.assertEqual(report['meta']['mode'], 'in-process')
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertEqual(report['routes']['checkout POST']['requests'], 1)
+        self.assertEqual(report['total']['requests'], 15)
+        for stats in report['routes'].values():
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+            self.assertGreater(stats['queries_per_request'], 0)
+        json.dumps(report)
+
+    # Percentiles use the nearest rank; comparisons show relative change
+    def test_percentile_and_compare(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+        old = {'routes': {'home': {'p50_ms': 10.0, 'queries_per_request': 4}}}
+        new = {'routes': {'home': {'p50_ms': 15.0, 'queries_per_request': 2}, 'cart': {'p50_ms': 1.0}}}
+        self.assertEqual(compare(old, new), [
+            ('home', 'p50_ms', 10.0, 15.0, 50.0),
+            ('home', 'queries_per_request', 4, 2, -50.0),
+        ])
+
+
+class RequestInstrumentationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.item = Item.objects.create(
+            name='Apple', price=Decimal('5.00'), stock=10, slug='apple', category='fruits'
+        )
+
+    # Every response carries its timings in a Server-Timing header
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('core:product', kwargs={'slug': 'apple'}))
+        header = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'tpl;dur=', 'cache;desc='):
+            self.assertIn(metric, header)
+        self.assertGreater(response.wsgi_request.metrics.queries, 0)
+        self.assertGreater(response.wsgi_request.metrics.template_ms, 0)
+
+    # Repeated identical queries and cache lookups are counted
+    def test_duplicates_and_cache_counters(self):
+        metrics = RequestMetrics()
+        metrics.record_query('SELECT 1 WHERE x = %s', (1,), 0.001)
+        metrics.record_query('SELECT 1 WHERE x = %s', (1,), 0.001)
+        metrics.record_query('SELECT 1 WHERE x = %s', (2,), 0.001)
+        self.assertEqual((metrics.queries, metrics.duplicates), (3, 1))
+
+        self.client.get(reverse('core:home'))
+        response = self.client.get(reverse('core:home'))
+        self.assertGreater(response.wsgi_request.metrics.cache_hits, 0)
+
+    # A structured DEBUG record is logged per request; sampled slow ones include their SQL
+    def test_logging(self):
+        with self.settings(SLOW_REQUEST_SAMPLE_RATE=1.0, SLOW_REQUEST_THRESHOLD_MS=0):
+            with self.assertLogs('core.instrumentation', level='DEBUG') as logs:
+                self.client.get(reverse('core:product', kwargs={'slug': 'apple'}))
+        record, slow = logs.records
+        self.assertEqual(record.levelname, 'DEBUG')
+        self.assertIn('queries', record.request_metrics)
+        self.assertEqual(slow.levelname, 'WARNING')
+        self.assertEqual(slow.name, 'core.instrumentation.slow')
+        self.assertTrue(slow.sql)
+        self.assertIn('core_item', slow.getMessage())
+
+        # At INFO only slow requests are logged
+        with self.settings(SLOW_REQUEST_SAMPLE_RATE=0.0):
+            with self.assertNoLogs('core.instrumentation', level='INFO'):
+                # A new client builds the middleware with these settings
+                Client().get(reverse('core:product', kwargs={'slug': 'apple'}))
+
+
+class LoggingTestCase(TestCase):
+    # Lazy arguments are only computed when the record is emitted
+    def test_lazy_argument(self):
+        calls = []
+        logger = logging.getLogger('core.views')
+        with self.assertLogs('core.views', level='INFO'):
+            logger.debug('count %s', Lazy(lambda: calls.append(1)))
+            logger.info('done')
+        self.assertEqual(calls, [])
+        with self.assertLogs('core.views', level='DEBUG') as logs:
+            logger.debug('count %s', Lazy(lambda: calls.append(1) or len(calls)))
+        self.assertEqual(logs.output, ['DEBUG:core.views:count 1'])
+
+    # Records are written by the listener thread, not the caller
+    def test_queue_handler(self):
+        threads = []
+
+        class Collect(logging.Handler):
+            def emit(self, record):
+                threads.append((threading.current_thread(), self.format(record)))
+
+        # The target's name sorts after the queue's, so dictConfig builds it later
+        self.addCleanup(configure_logging, settings.LOGGING_CONFIG, settings.LOGGING)
+        logging.config.dictConfig({
+            'version': 1,
+            'disable_existing_loggers': False,
+            'formatters': {'json': {'()': 'core.logs.JsonFormatter'}},
+            'handlers': {
+                'queue': {'()': 'core.logs.QueueListenerHandler', 'handlers': ['cfg://handlers.zcollect']},
+                'zcollect': {'()': Collect, 'formatter': 'json'},
+            },
+            'loggers': {'core.tests.queue': {'handlers': ['queue'], 'level': 'WARNING', 'propagate': False}},
+        })
+        logger = logging.getLogger('core.tests.queue')
+        handler = logger.handlers[0]
+        try:
+            logger.warning('slow %s', 'request', extra={'path': '/'})
+        finally:
+            handler.stop()
+
+        thread, line = threads[0]
+        self.assertIsNot(thread, threading.current_thread())
+        data = json.loads(line)
+        self.assertEqual((data['message'], data['path']), ('slow request', '/'))
+
+
+class PreventAutoLoginMiddlewareTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.item = Item.objects.create(
+            name='Apple', price=Decimal('5.00'), stock=10, slug='apple', category='fruits'
+        )
+        self.customer = User.objects.create_user(username='customer', password='password')
+        self.admin = User.objects.create_superuser(username='boss', password='password')
+
+    # Superusers are sent to the admin once, on the first request after login
+    def test_superuser_redirected_once(self):
+        self.client.login(username='boss', password='password')
+        response = self.client.get(reverse('core:promotions'))
+        self.assertRedirects(response, reverse('admin:index'), fetch_redirect_response=False)
+        response = self.client.get(reverse('core:promotions'))
+        self.assertEqual(response.status_code, 200)
+
+    # Logging in through the admin counts as having been sent there
+    def test_admin_login_clears_redirect(self):
+        response = self.client.post(
+            reverse('admin:login'), {'username': 'boss', 'password': 'password', 'next': reverse('admin:index')}
+        )
+        self.assertRedirects(response, reverse('admin:index'), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse('admin:index')).status_code, 200)
+        response = self.client.get(reverse('core:promotions'))
+        self.assertEqual(response.status_code, 200)
+
+    # The middleware never loads the user; the session itself comes from the cache
+    def test_overhead(self):
+        path = reverse('core:product', kwargs={'slug': 'apple'})
+        session_key = login_session(self.customer)
+        self.assertEqual(measure(LegacyPreventAutoLoginMiddleware, path, session_key, iterations=3)['queries'], 1)
+        self.assertEqual(measure(PreventAutoLoginMiddleware, path, session_key, iterations=3)['queries'], 0)
+        self.assertEqual(measure(PreventAutoLoginMiddleware, path, iterations=3)['queries'], 0)
+
+    # The comparison command reports both implementations per route
+    def test_command(self):
+        out = StringIO()
+        call_command('benchmark_middleware', iterations=2, stdout=out)
+        self.assertIn('product   customer', out.getvalue())
+
+
+class FragmentCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.apple = Item.objects.create(
+            name='Apple', price=Decimal('5.00'), stock=10, slug='apple', category='fruits', labels='vegan'
+        )
+        self.carrot = Item.objects.create(
+            name='Carrot', price=Decimal('2.00'), stock=10, slug='carrot', category='vegetables'
+        )
+
+    # Saving an item bumps its version and the sidebar version
+    def test_versions(self):
+        sidebar = get_sidebar_version()
+        version = self.apple.version
+        self.apple.save()
+        self.assertEqual(self.apple.version, version + 1)
+        self.apple.refresh_from_db()
+        self.assertEqual(self.apple.version, version + 1)
+        self.assertGreater(get_sidebar_version(), sidebar)
+
+    # A warm home page serves the cards and sidebar from cache
+    def test_warm_page_uses_fragments(self):
+        response = self.client.get(reverse('core:home'))
+        self.assertIn('product-card.html', [template.name for template in response.templates])
+        response = self.client.get(reverse('core:home'))
+        rendered = [template.name for template in response.templates]
+        self.assertNotIn('product-card.html', rendered)
+        self.assertNotIn('catalog-filters.html', rendered)
+        self.assertContains(response, 'Carrot')
+
+    # Item edits and promotion changes show up on the next request
+    def test_invalidation(self):
+        self.client.get(reverse('core:home'))
+        self.apple.name = 'Green Apple'
+        self.apple.save()
+        self.assertContains(self.client.get(reverse('core:home')), 'Green Apple')
+
+        promotion = Promotion.objects.create(
+            title='Half off', description='', discount_rate=Decimal('50.00'), is_active=True,
+            start_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=1),
+        )
+        promotion.products.add(self.carrot)
+        self.assertContains(self.client.get(reverse('core:home')), '$1.00')
+
+        # Expiry needs no signal: the promotion index version changes once it has passed
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + datetime.timedelta(days=2)):
+            response = self.client.get(reverse('core:home'))
+        self.assertNotContains(response, '$1.00')
+
+    # Saves limited to some fields still give the card a new key
+    def test_update_fields_bump_version(self):
+        self.client.get(reverse('core:home'))
+        version = self.apple.version
+        self.apple.name = 'Red Apple'
+        self.apple.save(update_fields=['name'])
+        self.assertEqual(Item.objects.get(pk=self.apple.pk).version, version + 1)
+        self.assertContains(self.client.get(reverse('core:home')), 'Red Apple')
+
+    # The sidebar keeps the current query in its links
+    def test_sidebar_varies_on_query(self):
+        self.client.get(reverse('core:home'))
+        response = self.client.get(reverse('core:home') + '?sort=price-asc')
+        self.assertContains(response, 'sort=price-asc&amp;category=fruits')
+
+
+class PreloadTemplatesTestCase(TestCase):
+    # Every project template compiles
+    def test_preload(self):
+        out = StringIO()
+        call_command('preload_templates', stdout=out)
+        self.assertIn('Compiled', out.getvalue())
+
+    # A syntax error fails the build step and names the template
+    def test_syntax_error(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'broken.html'), 'w') as f:
+                f.write('{% if %}')
+            templates = [{'BACKEND': 'django.template.backends.django.DjangoTemplates', 'DIRS': [directory]}]
+            with self.settings(TEMPLATES=templates):
+                err = StringIO()
+                with self.assertRaises(CommandError):
+                    call_command('preload_templates', stdout=StringIO(), stderr=err)
+        self.assertIn('broken.html', err.getvalue())
+
+
+class StaticAssetPipelineTestCase(TestCase):
+    def setUp(self):
+        self.source = tempfile.TemporaryDirectory()
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.source.cleanup)
+        self.addCleanup(self.root.cleanup)
+        os.makedirs(os.path.join(self.source.name, 'css'))
+        with open(os.path.join(self.source.name, 'css', 'site.css'), 'w') as f:
+            f.write('body { color: green; }\n' * 200)
+
+    def collect(self):
+        storages = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage'},
+        }
+        overrides = self.settings(STATICFILES_DIRS=[self.source.name], STATIC_ROOT=self.root.name, STORAGES=storages)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        return staticfiles_storage.stored_name('css/site.css')
+
+    # collectstatic writes hashed names with compressed siblings
+    def test_collectstatic(self):
+        hashed = self.collect()
+        self.assertRegex(hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root.name, hashed + '.gz'), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), b'body { color: green; }\n' * 200)
+
+    # The serving view picks the variant by Accept-Encoding and caches hashed names forever
+    def test_serve(self):
+        hashed = self.collect()
+        with open(os.path.join(self.root.name, hashed + '.br'), 'wb') as f:
+            f.write(b'brotli')
+
+        response = self.client.get('/static/' + hashed, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(b''.join(response.streaming_content), b'brotli')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+        response = self.client.get('/static/' + hashed, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        response = self.client.get('/static/css/site.css')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('must-revalidate', response['Cache-Control'])
+        # Unhashed files can be revalidated
+        response = self.client.get('/static/css/site.css', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+    # Pages render with the production storage even if they reference files that were never collected
+    def test_render_with_missing_files(self):
+        shutil.copy(
+            os.path.join(settings.STATICFILES_DIRS[0], 'css', 'mdb.trimmed.min.css'),
+            os.path.join(self.source.name, 'css'),
+        )
+        self.collect()
+        with self.assertLogs('core.staticfiles', 'WARNING') as logs:
+            html = render_to_string('base.html')
+        self.assertIn('js/jquery-3.3.1.min.js was not collected', '\n'.join(logs.output))
+        self.assertRegex(html, r'/static/css/mdb\.trimmed\.min\.[0-9a-f]{12}\.css')
+        self.assertIn('/static/css/bootstrap.min.css', html)
+        self.assertIn('/static/js/jquery-3.3.1.min.js', html)
+
+
+class AssetTrimmingTestCase(TestCase):
+    # Classes come from attributes, {% if %} branches, template variables and scripts
+    def test_scan_template(self):
+        tokens = scan_template(
+            '<div id="cart" class="card {% if x %}active{% endif %} alert-{{ tags }}" data-mdb-ripple-init>'
+            '<script>el.classList.add("is-open");</script>'
+        )
+        for name in ('card', 'active', 'alert-danger', 'is-open'):
+            self.assertTrue(tokens.has_class(name), name)
+        self.assertFalse(tokens.has_class('btn'))
+        self.assertIn('cart', tokens.ids)
+        self.assertIn('data-mdb-ripple-init', tokens.attributes)
+
+    # Unused rules and selectors go; licence comments, at-rules and element rules stay
+    def test_trim_css(self):
+        tokens = Tokens()
+        tokens.add_classes('card btn')
+        css = (
+            '/*! licence */:root{--x: ;}.card,.modal{color:red}.carousel{color:blue}'
+            '@media (min-width:576px){.btn:not(.unused){margin:0}.navbar{margin:1px}}'
+            '[data-unused]{top:0}@keyframes spin{from{opacity:0}to{opacity:1}}a{color:inherit}'
+        )
+        self.assertEqual(
+            trim_css(css, tokens),
+            '/*! licence */:root{--x: ;}.card{color:red}'
+            '@media (min-width:576px){.btn:not(.unused){margin:0}}'
+            '@keyframes spin{from{opacity:0}to{opacity:1}}a{color:inherit}',
+        )
+
+    # The command writes the trimmed stylesheet and reports each page
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            out = StringIO()
+            call_command('trim_assets', output_dir=directory, stdout=out)
+            with open(os.path.join(directory, 'css', 'mdb.trimmed.min.css')) as f:
+                trimmed = f.read()
+        self.assertIn('.dropdown-menu', trimmed)
+        self.assertNotIn('.carousel-item', trimmed)
+        self.assertIn('home-page.html', out.getvalue())
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.apple = Item.objects.create(
+            name='Apple', price=Decimal('5.00'), stock=10, slug='apple', category='fruits'
+        )
+
+    def revalidate(self, url, response):
+        return self.client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+
+    # Repeat requests get a 304 without running the catalog queries
+    def test_not_modified(self):
+        for url in (
+            reverse('core:home') + '?sort=price-asc',
+            reverse('core:product', kwargs={'slug': 'apple'}),
+            reverse('core:promotions'),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    # Catalog writes, other filters and other users change the validators
+    def test_validators_change(self):
+        url = reverse('core:home')
+        response = self.client.get(url)
+        self.assertNotEqual(response['ETag'], self.client.get(url + '?sort=price-desc')['ETag'])
+
+        self.apple.price = Decimal('4.00')
+        self.apple.save()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+        response = self.client.get(url)
+        Promotion.objects.create(
+            title='Sale', description='', discount_rate=Decimal('10.00'),
+            start_date=timezone.now(), end_date=timezone.now() + datetime.timedelta(days=1),
+        ).products.add(self.apple)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+        response = self.client.get(url)
+        User.objects.create_user(username='shopper', password='password')
+        self.client.login(username='shopper', password='password')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    # Pages with flash messages waiting are never answered with a 304
+    def test_no_validators_with_pending_messages(self):
+        User.objects.create_user(username='shopper', password='password')
+        self.client.login(username='shopper', password='password')
+        self.client.get(reverse('core:order-summary'))  # Queues "Your cart is empty"
+        response = self.client.get(reverse('core:home'))
+        self.assertFalse(response.has_header('ETag'))
+        self.assertContains(response, 'Your cart is empty')
+        self.assertTrue(self.client.get(reverse('core:home')).has_header('ETag'))
+
+
+class AnonymousPageCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.apple = Item.objects.create(
+            name='Apple', price=Decimal('5.00'), stock=10, slug='apple', category='fruits'
+        )
+
+    # Repeat anonymous requests are answered from the cache without queries
+    def test_anonymous_hit(self):
+        for url in (
+            reverse('core:home') + '?sort=price-asc&category=fruits',
+            reverse('core:product', kwargs={'slug': 'apple'}),
+            reverse('core:promotions'),
+        ):
+            response = self.client.get(url)
+            with self.assertNumQueries(0):
+                cached = self.client.get(url)
+            self.assertEqual(cached.status_code, 200)
+            self.assertEqual(cached.content, response.content)
+        # The same parameters in another order share the entry
+        with self.assertNumQueries(0):
+            self.client.get(reverse('core:home') + '?category=fruits&sort=price-asc')
+
+    # Item and Promotion saves purge the cached pages
+    def test_catalog_writes_purge(self):
+        url = reverse('core:product', kwargs={'slug': 'apple'})
+        self.client.get(url)
+        self.apple.name = 'Green apple'
+        self.apple.save()
+        self.assertContains(self.client.get(url), 'Green apple')
+
+        Promotion.objects.create(
+            title='Sale', description='', discount_rate=Decimal('10.00'),
+            start_date=timezone.now(), end_date=timezone.now() + datetime.timedelta(days=1),
+        ).products.add(self.apple)
+        self.assertContains(self.client.get(url), '4.50')
+
+    # Entries expire when the next promotion starts or ends
+    def test_timeout_capped_at_promotion_boundary(self):
+        now = timezone.now()
+        with self.settings(PAGE_CACHE_TIMEOUT=300):
+            self.assertEqual(page_cache_timeout(now), 300)
+            Promotion.objects.create(
+                title='Flash sale', description='', discount_rate=Decimal('10.00'),
+                start_date=now + datetime.timedelta(seconds=90), end_date=now + datetime.timedelta(days=1),
+            ).products.add(self.apple)
+            self.assertEqual(page_cache_timeout(now), 90)
+
+    # Signed-in users bypass the cache and see their own navbar and cart
+    def test_authenticated_bypass(self):
+        url = reverse('core:home')
+        anonymous = self.client.get(url)
+        User.objects.create_user(username='shopper', password='password')
+        self.client.login(username='shopper', password='password')
+        self.client.get(reverse('core:add-to-cart', kwargs={'slug': 'apple'}))
+        response = self.client.get(url)
+        self.assertNotEqual(response.content, anonymous.content)
+        self.assertContains(response, 'Logout')
+        self.client.logout()
+        self.assertNotContains(self.client.get(url), 'Logout')
+
+    # Writes and responses setting cookies are never cached
+    def test_not_cached(self):
+        calls = []
+
+        def view(request):
+            calls.append(request.method)
+            response = HttpResponse('ok')
+            if 'cookie' in request.GET:
+                response.set_cookie('seen', '1')
+            return response
+
+        cached_view = anonymous_page_cache(view)
+        factory = RequestFactory()
+        for _ in range(2):
+            cached_view(factory.post('/'))
+            cached_view(factory.get('/?cookie=1'))
+        self.assertEqual(calls, ['POST', 'GET', 'POST', 'GET'])
+        cached_view(factory.get('/'))
+        cached_view(factory.get('/'))
+        self.assertEqual(len(calls), 5)
+
+
+class CacheBackendsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    # One alias per namespace, all on the same store with their own key prefix
+    def test_cache_settings(self):
+        config = cache_settings('redis', 'redis://cache:6379/0', version=3)
+        self.assertEqual(set(config), {'default', *NAMESPACES})
+        self.assertEqual(config['sessions']['BACKEND'], 'core.cache.RedisCache')
+        self.assertEqual(config['catalog']['KEY_PREFIX'], 'greenpie:catalog')
+        self.assertEqual({alias['LOCATION'] for alias in config.values()}, {'redis://cache:6379/0'})
+        self.assertEqual(config['carts']['VERSION'], 3)
+        self.assertTrue(cache_settings('file')['catalog']['LOCATION'])
+        with self.assertRaises(ValueError):
+            cache_settings('memcached')
+
+    # Namespaces do not see each other's keys
+    def test_namespaces_isolated(self):
+        caches['catalog'].set('key', 'catalog')
+        caches['promotions'].set('key', 'promotions')
+        self.assertEqual(caches['catalog'].get('key'), 'catalog')
+        self.assertEqual(caches['promotions'].get('key'), 'promotions')
+        self.assertIsNone(caches['carts'].get('key'))
+
+    # The test runner replaces the configured store with locmem
+    def test_runner_uses_locmem(self):
+        self.assertEqual({alias['BACKEND'] for alias in settings.CACHES.values()}, {'core.cache.LocMemCache'})
+
+    # Pending counts of every live backend are flushed at exit, which is registered once
+    def test_flush_all_stats(self):
+        backend = caches.create_connection('carts')
+        backend.get('absent')
+        self.assertIn(backend, _backends)
+        flush_all_stats()
+        self.assertEqual(caches['carts'].read_stats(), (0, 1))
+        # Backends of finished threads are not kept alive
+        ref = weakref.ref(backend)
+        del backend
+        gc.collect()
+        self.assertIsNone(ref())
+
+    # Hits and misses are counted per namespace and shared between cache instances
+    def test_hit_miss_counters(self):
+        catalog = caches['catalog']
+        catalog.set('present', 1)
+        catalog.get('present')
+        catalog.get('absent')
+        catalog.get_many(['present', 'absent'])
+        self.assertEqual(catalog.read_stats(), (2, 2))
+        self.assertEqual(caches['promotions'].read_stats(), (0, 0))
+        # Another thread or process reads the same counters
+        self.assertEqual(caches.create_connection('catalog').read_stats(), (2, 2))
+        catalog.reset_stats()
+        self.assertEqual(catalog.read_stats(), (0, 0))
+
+    # Counters work on the file backend, whose incr() goes through get()
+    def test_file_backend_counters(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = FileBasedCache(directory, {'KEY_PREFIX': 'test'})
+            store.set('present', 1)
+            store.get('present')
+            store.get('absent')
+            self.assertEqual(store.read_stats(), (1, 1))
+            store.get('absent')
+            self.assertEqual(store.read_stats(), (1, 2))
+
+    # Catalog pages use the catalog namespace and sessions the sessions one
+    def test_subsystems_use_namespaces(self):
+        Item.objects.create(name='Apple', price=Decimal('5.00'), stock=10, slug='apple', category='fruits')
+        self.client.get(reverse('core:home'))
+        self.assertGreater(sum(caches['catalog'].read_stats()), 0)
+        self.assertIsNotNone(caches['promotions'].get('promotions:active-index'))
+
+        User.objects.create_user(username='shopper', password='password')
+        self.client.login(username='shopper', password='password')
+        session_key = self.client.session.session_key
+        self.assertIsNotNone(caches['sessions'].get(KEY_PREFIX + session_key))
+
+    # The command prints every namespace and can reset the counters
+    def test_cache_stats_command(self):
+        caches['catalog'].get('absent')
+        out = StringIO()
+        call_command('cache_stats', '--reset', stdout=out)
+        output = out.getvalue()
+        for namespace in ('catalog', 'promotions', 'carts', 'sessions'):
+            self.assertIn(namespace, output)
+        self.assertIn('Counters reset', output)
+        self.assertEqual(caches['catalog'].read_stats(), (0, 0))
@@ -1,17 +1,19 @@
 
 from django.urls import path
 #from django.contrib.auth.views import LoginView, LogoutView
-from .views import (account_view, CheckOutView, ItemDetailView, checkout, HomeView, add_to_cart, remove_from_cart, OrderSummaryView, remove_single_item_from_cart, OrderHistoryView, OrderDetailView, RescheduleOrderView, PromotionsView, complete_profile)
+from .views import (account_view, CheckOutView, ItemDetailView, checkout, HomeView, add_to_cart, remove_from_cart, OrderSummaryView, remove_single_item_from_cart, OrderHistoryView, OrderDetailView, RescheduleOrderView, PromotionsView, complete_profile, autocomplete, update_cart)
 
 app_name = 'core'
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
+    path('search/autocomplete/', autocomplete, name='autocomplete'),
     path('product/<slug>/', ItemDetailView.as_view(), name='product'),
     path('checkout/', CheckOutView.as_view(), name='checkout-page'),
     path('add-to-cart/<slug>/', add_to_cart, name='add-to-cart'),
     path('remove-from-cart/<slug>/', remove_from_cart, name='remove-from-cart'),
     path('order-summary/', OrderSummaryView.as_view(), name='order-summary'),
+    path('cart/update/', update_cart, name='update-cart'),
     path('remove-item-from-cart/<slug>/', remove_single_item_from_cart,
          name='remove-single-item-from-cart'),
     path('order-history', OrderHistoryView.as_view(), name='order-history'),
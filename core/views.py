@@ -2,32 +2,65 @@ from django.shortcuts import render, get_object_or_404
 from django.views.generic import ListView, DetailView, View
 from django.shortcuts import redirect
 from django.utils import timezone
-from .models import Item, OrderItem, Order, Address, Payment, UserProfile, Promotion
+from django.utils.decorators import method_decorator
+from .models import Item, OrderItem, Order, Address, Payment, UserProfile
 from django.contrib import messages
 from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+import json
+import logging
 import uuid
 from decimal import Decimal
 from .forms import UserForm, ProfileForm, RescheduleForm, UserProfileForm
-from django.db.models import Q
-from .models import LABEL_CHOICES
-from .models import CATEGORY_CHOICES
+from .promotions import get_promotion_index
+from .pagination import InvalidCursor, paginate_keyset
+from .search import get_search_backend
+from .facets import count_facets, get_catalog_facets
+from .fragments import FRAGMENT_TIMEOUT, get_sidebar_version, sidebar_query
+from .conditional import catalog_condition
+from .pagecache import anonymous_page_cache
+from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch, prefetch_related_objects
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET, require_POST
+from .autocomplete import suggest
+from .logs import Lazy
+
+logger = logging.getLogger(__name__)
+
+# Largest quantity of one item a cart line may hold
+MAX_LINE_QUANTITY = 99
 
 
 def checkout(request):
     return render(request, "checkout.html")
 
 def productlist(request):
+    paginator = Paginator(Item.objects.with_active_discount().order_by('id'), HomeView.paginate_by)
+    page_obj = paginator.get_page(request.GET.get('page'))
     context = {
-        'items': Item.objects.all()
+        'items': page_obj,
+        'page_obj': page_obj,
     }
     return render(request, "product-page.html", context)
 
+@method_decorator(anonymous_page_cache, name='get')
+@method_decorator(catalog_condition, name='get')
 class HomeView(ListView):
     model = Item 
     template_name = "home-page.html"
     context_object_name = "object_list"
+    paginate_by = 24
+
+    # Keyset (seek) pagination keys for each sort, used when ?cursor= is given
+    KEYSET_KEYS = {
+        "price-asc": [("effective_price", False), ("id", False)],
+        "price-desc": [("effective_price", True), ("id", False)],
+        "relevance": [("search_rank", True), ("id", False)],
+        None: [("id", False)],
+    }
     
     def get_queryset(self):
         query = self.request.GET.get("q")
@@ -36,13 +69,12 @@ class HomeView(ListView):
         labels = self.request.GET.getlist("labels")
 
 
-        qs = Item.objects.all()
+        qs = Item.objects.with_active_discount()
 
         if query:
-            qs = qs.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query)
-            )
+            qs = get_search_backend().search(qs, query)
+        # Facets are counted before the category/label filters are applied
+        self.search_queryset = qs
 
         if category:
             qs = qs.filter(category__in=category)
@@ -50,35 +82,75 @@ class HomeView(ListView):
         if labels:
             qs = qs.filter(labels__in=labels)
 
+        # Sort on the price customers actually pay
         if sort == "price-asc":
-            qs = qs.order_by("price")
+            qs = qs.order_by("effective_price", "id")
         elif sort == "price-desc":
-            qs = qs.order_by("-price")
+            qs = qs.order_by("-effective_price", "id")
+        elif query:
+            # Most relevant matches first
+            qs = qs.order_by("-search_rank", "id")
+        else:
+            qs = qs.order_by("id")
 
         return qs
 
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get("cursor")
+        if cursor is None:
+            return super().paginate_queryset(queryset, page_size)
+
+        sort = self.request.GET.get("sort")
+        if sort not in self.KEYSET_KEYS and self.request.GET.get("q"):
+            sort = "relevance"
+        keys = self.KEYSET_KEYS.get(sort, self.KEYSET_KEYS[None])
+        try:
+            page = paginate_keyset(queryset, keys, cursor, page_size)
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        return None, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Fetch all unique categories from Item
-        category_dict = dict(CATEGORY_CHOICES)
-        category_keys = Item.objects.values_list("category", flat=True).distinct()
-        context["categories"] = [(key, category_dict.get(key, key)) for key in category_keys]
-
-        # Fetch all unique labels from Item
-        label_dict = dict(LABEL_CHOICES)
-        label_keys = Item.objects.values_list("labels", flat=True).distinct()
-        context["labels"] = [(key, label_dict.get(key, key)) for key in label_keys]
+        # Category and label sidebars with item counts
+        category = self.request.GET.getlist("category")
+        labels = self.request.GET.getlist("labels")
+        if self.request.GET.get("q") or category or labels:
+            facets = count_facets(self.search_queryset, category, labels)
+        else:
+            facets = get_catalog_facets()
+            # Unfiltered sidebars only change with the catalog, so they are cached
+            context["sidebar_version"] = get_sidebar_version()
+            context["sidebar_query"] = sidebar_query(self.request.GET)
+        context["categories"], context["labels"] = facets
+        # Product card fragments are cached per item version and promotion set
+        context["promotion_version"] = get_promotion_index().version
+        context["fragment_timeout"] = FRAGMENT_TIMEOUT
 
         return context
 
 
     def dispatch(self, request, *args, **kwargs):
-        print(f"User auth status on home: {request.user.is_authenticated}")
+        logger.debug("User auth status on home: %s", Lazy(lambda: request.user.is_authenticated))
         if request.user.is_authenticated and request.user.is_superuser:
             from django.contrib.auth import logout
             logout(request)
         return super().dispatch(request, *args, **kwargs)
 
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+
+@require_GET
+def autocomplete(request):
+    """Search-as-you-type suggestions, served from the in-memory prefix index."""
+    try:
+        limit = int(request.GET.get("limit", AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+    limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+    return JsonResponse({"results": suggest(request.GET.get("q", ""), limit)})
+
 class CheckOutView(LoginRequiredMixin, View):
     def get(self, *args, **kwargs):
         order = Order.objects.filter(user=self.request.user, is_ordered=False).first()
@@ -138,10 +210,15 @@ class CheckOutView(LoginRequiredMixin, View):
         return redirect("core:order-history")
 
 
+@method_decorator(anonymous_page_cache, name='get')
+@method_decorator(catalog_condition, name='get')
 class ItemDetailView(DetailView):
     model = Item
     template_name = "product-page.html"
 
+    def get_queryset(self):
+        return Item.objects.with_active_discount()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         item = context['object']
@@ -156,10 +233,10 @@ class OrderSummaryView(LoginRequiredMixin, View):
         order = Order.objects.filter(user=self.request.user, is_ordered=False).first()
 
         if order:
-            print(order)
-            print("Order items:", order.items.all())
-            context = {'object': order}
-            print(context["object"])
+            # Price all lines up front so the template reuses them
+            order.pricing
+            logger.debug("Order summary for %s: %s lines", order, Lazy(lambda: len(order.pricing.lines)))
+            context = {'object': order, 'max_quantity': MAX_LINE_QUANTITY}
             return render(self.request, 'order-summary.html', context)
         
         # Enhanced messaging for better clarity
@@ -183,6 +260,7 @@ class OrderHistoryView(LoginRequiredMixin, View):
 class OrderDetailView(LoginRequiredMixin, View):
     def get(self, request, slug, *args, **kwargs):
         order = get_object_or_404(Order, slug=slug, user=request.user, is_ordered=True)
+        order.pricing
         context = {'object': order}
         return render(request, 'order-detail.html', context)
 
@@ -212,13 +290,16 @@ class RescheduleOrderView(LoginRequiredMixin, View):
         return render(request, 'reschedule-order.html', {'form': form, 'order': order})
     
 
+@method_decorator(anonymous_page_cache, name='get')
+@method_decorator(catalog_condition, name='get')
 class PromotionsView( View):
     def get(self, request):
-        active_promotions = Promotion.objects.filter(
-            is_active=True,
-            start_date__lte=timezone.now(),
-            end_date__gte=timezone.now()
-        ).order_by('end_date')
+        # Already ordered by end date
+        active_promotions = list(get_promotion_index().active)
+        # The index keeps no product lists; this page is the only one that shows them
+        prefetch_related_objects(
+            active_promotions, Prefetch('products', queryset=Item.objects.only('name', 'slug'))
+        )
         
         return render(request, 'promotions.html', {'promotions': active_promotions})
     
@@ -226,31 +307,37 @@ class PromotionsView( View):
 @login_required
 def add_to_cart(request, slug):
     item = get_object_or_404(Item, slug=slug)
-    
-    # Get or create cart for current user
-    order = Order.get_or_create_cart(request.user)
-    print(f"[DEBUG] Order retrieved or created - ID: {order.id}, User: {order.user.username}, Existing items count: {order.items.count()}")
-
-    # Filter for existing OrderItem in this cart
-    order_items = order.items.filter(item=item, user=request.user, ordered=False, order_id = order.id)
-    print(f"[DEBUG] Matching OrderItem(s) in current cart: {order_items}")
-
-    if order_items.exists():
-        order_item = order_items.first()
-        print(f"[DEBUG] OrderItem exists - Current quantity: {order_item.quantity}")
-        order_item.quantity += 1
-        order_item.save()
-        print(f"[DEBUG] Updated quantity: {order_item.quantity}")
-        messages.info(request, f"{item.name} were added to your cart (Total: {order_item.quantity} left).")
-    else:
-        order_item = OrderItem.objects.create(item=item, user=request.user, quantity=1, ordered=False, order_id = order.id)
-        print(f"[DEBUG] New OrderItem created - ID: {order_item.id}, Quantity: {order_item.quantity}")
-        order.items.add(order_item)
-        order.save()
-        print(f"[DEBUG] OrderItem added to Order ID: {order.id}. Total items now: {order.items.count()}")
-        messages.info(request, f"{item.name} added to your cart.")
-    
-    print(f"[DEBUG] Redirecting to order summary...")
+
+    with transaction.atomic():
+        # Get or create cart for current user
+        order = Order.get_or_create_cart(request.user)
+        logger.debug("Order retrieved or created - ID: %s, User: %s", order.id, request.user.username)
+
+        # Increment in the database in one statement, so concurrent adds are not lost
+        lines = OrderItem.objects.filter(order=order, item=item)
+        created = False
+        if not lines.update(quantity=F('quantity') + 1):
+            # The (order, item) unique constraint makes this safe against double clicks
+            order_item, created = OrderItem.objects.get_or_create(
+                order=order,
+                item=item,
+                defaults={'user': request.user, 'quantity': 1, 'ordered': False},
+            )
+            if not created:
+                # Another request created the line after the update found none
+                lines.update(quantity=F('quantity') + 1)
+
+        if created:
+            logger.debug("New OrderItem created - ID: %s, Quantity: %s", order_item.id, order_item.quantity)
+            messages.info(request, f"{item.name} added to your cart.")
+        else:
+            # Read back only for the message: UPDATE does not return the new quantity
+            quantity = lines.values_list('quantity', flat=True).get()
+            logger.debug("OrderItem exists - Quantity now: %s", quantity)
+            messages.info(request, f"{item.name} were added to your cart (Total: {quantity} left).")
+        order.invalidate_pricing()
+
+    logger.debug("Cart %s now has %s lines", order.id, Lazy(order.items.count))
     return redirect("core:order-summary")
 
 
@@ -258,66 +345,119 @@ def add_to_cart(request, slug):
 def remove_from_cart(request, slug):
     item = get_object_or_404(Item, slug=slug)
 
-    try:
-        order = Order.objects.get(user=request.user, is_ordered=False)
-    except Order.DoesNotExist:
-        messages.info(request, "You do not have an active order.")
-        return redirect("core:product", slug=slug)
-
-    
-    order_items = OrderItem.objects.filter(item=item, user=request.user, ordered=False)
-
-    if order_items.exists():
-        for order_item in order_items:
-           
-            order.items.remove(order_item)
-            order_item.delete() 
+    with transaction.atomic():
+        order = Order.objects.filter(user=request.user, is_ordered=False).first()
+        if not order:
+            messages.info(request, "You do not have an active order.")
+            return redirect("core:product", slug=slug)
 
-        messages.info(request, f"All {item.name} items have been removed from your cart.")
+        # Only this cart's line; lines of placed orders are left alone
+        deleted, _ = order.items.filter(item=item).delete()
+        order.invalidate_pricing()
 
-        if order.items.count() == 0:
-            order.delete()
-            
-    else:
-        messages.info(request, f"{item.name} is not in your cart.")
+        if deleted:
+            messages.info(request, f"All {item.name} items have been removed from your cart.")
+            if not order.items.exists():
+                order.delete()
+        else:
+            messages.info(request, f"{item.name} is not in your cart.")
 
     return redirect("core:order-summary")
 
 
-
-
-
 @login_required
 def remove_single_item_from_cart(request, slug):
     item = get_object_or_404(Item, slug=slug)
-    order = Order.objects.filter(user=request.user, is_ordered=False).first()
 
-    if order:
-        # Check if the item is already in the cart
-        order_item = order.items.filter(item=item, user=request.user, ordered=False).first()
+    with transaction.atomic():
+        order = Order.objects.filter(user=request.user, is_ordered=False).first()
 
-        if order_item:
-            if order_item.quantity > 1:
-                # Decrease the quantity by 1
-                order_item.quantity -= 1
-                order_item.save()
+        if order:
+            lines = order.items.filter(item=item)
+            # Decrease the quantity by 1, or remove the line if it was the last one
+            if lines.filter(quantity__gt=1).update(quantity=F('quantity') - 1):
                 messages.info(request, f"The quantity of {item.name} has been updated.")
-            else:
-                # Remove the item completely from the cart
-                order.items.remove(order_item)
-                order_item.delete()
+            elif lines.delete()[0]:
                 messages.info(request, f"{item.name} has been removed from your cart.")
-            
+            else:
+                # Item is not in the cart
+                messages.info(request, f"{item.name} is not in your cart.")
+            order.invalidate_pricing()
         else:
-            # Item is not in the cart
-            messages.info(request, f"{item.name} is not in your cart.")
-            
-    else:
-        # No active order
-        messages.info(request, "You do not have an active order.")
+            # No active order
+            messages.info(request, "You do not have an active order.")
     return redirect("core:order-summary")
 
 
+@login_required
+@require_POST
+def update_cart(request):
+    """Apply a batch of ``{slug: quantity}`` changes and return the new cart totals.
+
+    A quantity of 0 removes the line, and a cart left without lines is deleted.
+    Everything is written in one transaction with at most one bulk delete,
+    update and create.
+    """
+    try:
+        quantities = json.loads(request.body)
+    except ValueError:
+        quantities = None
+    # Whole numbers only: no floats, strings or booleans (bool subclasses int)
+    if not isinstance(quantities, dict) or any(type(quantity) is not int for quantity in quantities.values()):
+        return JsonResponse({"error": "Expected a JSON object of {slug: quantity}."}, status=400)
+    if not quantities:
+        return JsonResponse({"error": "No changes given."}, status=400)
+    if any(quantity < 0 for quantity in quantities.values()):
+        return JsonResponse({"error": "Quantities cannot be negative."}, status=400)
+    if any(quantity > MAX_LINE_QUANTITY for quantity in quantities.values()):
+        return JsonResponse({"error": f"At most {MAX_LINE_QUANTITY} of an item per order."}, status=400)
+
+    items = {item.slug: item for item in Item.objects.filter(slug__in=quantities)}
+    unknown = sorted(set(quantities) - set(items))
+    if unknown:
+        return JsonResponse({"error": "Unknown items.", "unknown": unknown}, status=400)
+
+    try:
+        with transaction.atomic():
+            order = Order.get_or_create_cart(request.user)
+            lines = {
+                line.item_id: line
+                for line in order.items.filter(item__in=items.values())
+            }
+
+            to_create, to_update, to_delete = [], [], []
+            for slug, quantity in quantities.items():
+                item = items[slug]
+                line = lines.get(item.id)
+                if line is None:
+                    if quantity:
+                        to_create.append(OrderItem(
+                            item=item, user=request.user, quantity=quantity, ordered=False, order=order
+                        ))
+                elif quantity == 0:
+                    to_delete.append(line.pk)
+                elif quantity != line.quantity:
+                    line.quantity = quantity
+                    to_update.append(line)
+
+            if to_delete:
+                OrderItem.objects.filter(pk__in=to_delete).delete()
+            if to_update:
+                OrderItem.objects.bulk_update(to_update, ["quantity"])
+            if to_create:
+                OrderItem.objects.bulk_create(to_create)
+            order.invalidate_pricing()
+            totals = order.pricing.as_json()
+            if not totals["lines"]:
+                # Like remove_from_cart, leave no empty cart behind
+                order.delete()
+    except IntegrityError:
+        # Another request added one of these lines first
+        return JsonResponse({"error": "The cart changed, please retry."}, status=409)
+
+    return JsonResponse(totals)
+
+
 @login_required
 def account_view(request):
     if not hasattr(request.user, 'userprofile'):
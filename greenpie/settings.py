@@ -1,5 +1,7 @@
 import os
 
+from core.cache import cache_settings
+
 ENVIRONMENT = os.getenv('ENVIRONMENT', 'development')
 
 DEBUG = True
@@ -27,6 +29,7 @@ INSTALLED_APPS = [
 SITE_ID = 1 
 
 MIDDLEWARE = [
+    'core.instrumentation.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,6 +43,14 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'greenpie.urls'
 
+# Request instrumentation (core.instrumentation)
+SERVER_TIMING_HEADER = True  # Send timings to the browser devtools
+SLOW_REQUEST_THRESHOLD_MS = 500  # Requests slower than this are logged with their SQL...
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv('SLOW_REQUEST_SAMPLE_RATE', '0.1'))  # ...if they were sampled
+
+# Whole-page cache for anonymous catalog requests (core.pagecache), also cut short by promotion boundaries
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '300'))
+
 
 TEMPLATES = [
     {
@@ -82,6 +93,20 @@ DATABASES = {
     }
 }
 
+# Cache store (core.cache): a directory for a single node (CACHE_LOCATION) or a
+# Redis-protocol server shared by every instance (REDIS_URL); tests use locmem (core.testing)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis' if os.getenv('REDIS_URL') else 'file')
+CACHES = cache_settings(
+    CACHE_BACKEND,
+    location=os.getenv('REDIS_URL') if CACHE_BACKEND == 'redis' else os.getenv('CACHE_LOCATION', ''),
+    version=int(os.getenv('CACHE_VERSION', '1')),  # Raise to orphan keys pickled by older code
+)
+# Sessions are read from the cache and written through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+TEST_RUNNER = 'core.testing.LocMemCacheTestRunner'
+
 if ENVIRONMENT == 'production':
     DEBUG = False
     SECRET_KEY = os.getenv('SECRET_KEY')
@@ -93,6 +118,48 @@ if ENVIRONMENT == 'production':
     SECURE_REDIRECT_EXEMPT = []
     SECURE_SSL_REDIRECT = True
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+    # Hashed, precompressed static files written by collectstatic (see core.staticfiles)
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage'},
+    }
+    # Parse each template once per process; `manage.py preload_templates` checks them at build time
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
+# Logging goes through a queue so request threads never block on the write
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')  # DEBUG shows the cart and auth traces
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+        'json': {'()': 'core.logs.JsonFormatter'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'plain' if DEBUG else 'json',
+        },
+        'queue': {
+            '()': 'core.logs.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': 'WARNING'},
+    'loggers': {
+        'core': {'handlers': ['queue'], 'level': LOG_LEVEL, 'propagate': False},
+        # Replaces Django's own console handler, which would print everything a second time via root
+        'django': {'handlers': ['queue'], 'level': 'INFO', 'propagate': False},
+        # 4xx responses are client errors, and runserver already logs each request
+        'django.request': {'level': 'ERROR'},
+    },
+}
 
 LOGIN_URL = '/accounts/login/'  # Explicit login URL
 LOGOUT_REDIRECT_URL = '/'  # Where to redirect after logout
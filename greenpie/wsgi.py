@@ -7,3 +7,15 @@ WSGI_APPLICATION = 'api.wsgi.app'
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'greenpie.settings')
 
 application = get_wsgi_application()
+
+
+def _preload_templates():
+    from django.conf import settings
+    from core.template_preload import preload_templates
+
+    # Compile templates while the function initialises, not on its first request
+    if not settings.DEBUG:
+        preload_templates()
+
+
+_preload_templates()